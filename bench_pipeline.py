@@ -0,0 +1,241 @@
+"""headless benchmarks for the serial -> Model -> PlotView pipeline.
+
+run with
+    QT_QPA_PLATFORM=offscreen python bench_pipeline.py [--rates 500 2000 8000] [--seconds 3]
+
+synthetic frames are written to a capture file at a controlled rate and replayed through
+the real SerialIOHandler thread, Model.update, CircularBuffer and the Controller render
+tick, so the numbers cover the same code the GUI runs.
+
+with --emulator the serial side is measured on its own against mcu_emulator's pty: port
+handshake, pyserial read sizes, frames lost on the way and command latency from
+queue_latest_tx to the port write.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+
+import capture
+from gui_utils import RX_BATCH_MAX, RxPacket, SerialIOHandler, TxPacket, encode_batch_frames, encode_frames
+from mcu_emulator import McuEmulator
+from modelviewcontroller import Controller, Model, PlotView
+
+
+def synthetic_samples(rate_hz, seconds):
+    n = int(rate_hz * seconds)
+    t = np.arange(n) / rate_hz
+    samples = np.zeros(n, dtype=RxPacket.serial_wire_dtype)
+    samples["timestamp"] = 1000 + (t * 1000).astype(np.uint32)
+    for i in range(4):
+        samples[f"echo_stepper{i}"] = (3000 * np.sin(2 * np.pi * (0.5 + i) * t)).astype(np.int32)
+    samples["encoder_angle"] = np.arange(n) % 3600
+    samples["open_loop_angle"] = np.arange(n) % 3600
+    return samples
+
+
+def write_capture(path, rate_hz, seconds, read_interval=0.005):
+    """split the stream into reads the size a port would hand over every read_interval"""
+    stream = encode_frames(synthetic_samples(rate_hz, seconds))
+    frames_per_read = max(1, int(rate_hz * read_interval))
+    read_size = frames_per_read * (RxPacket.sizeof() + 2)
+
+    writer = capture.CaptureWriter(path)
+    for i, offset in enumerate(range(0, len(stream), read_size)):
+        writer.record(capture.RAW_RX, stream[offset : offset + read_size], host_ns=int(i * read_interval * 1e9))
+    writer.close()
+    return int(rate_hz * seconds)
+
+
+def bench_ingest(rate_hz=8000, seconds=5.0, read_size=2048, batch=None):
+    """raw decode throughput of SerialIOHandler.ingest + publish, no Qt involved. batch
+    packs that many samples into each frame"""
+    samples = synthetic_samples(rate_hz, seconds)
+    if batch:
+        stream = encode_batch_frames(samples, round(1e6 / rate_hz), batch)
+    else:
+        stream = encode_frames(samples)
+    handler = SerialIOHandler()
+
+    start = time.perf_counter()
+    for offset in range(0, len(stream), read_size):
+        samples = handler.ingest(stream[offset : offset + read_size])
+        handler.rx_ring.write(samples)
+        handler.rx_ring.consume(len(handler.rx_ring.peek()))
+    elapsed = time.perf_counter() - start
+
+    packets = int(handler.rx_ring.indices[0])
+    return {"batch": batch or 1, "packets": packets, "packets_per_s": packets / elapsed}
+
+
+class TimedController(Controller):
+    """records how long every render takes. renders follow the data (capped at the
+    Controller's max_fps), so the tick count is how many frames were actually drawn"""
+
+    def __init__(self, model, view):
+        self.tick_times = []
+        super().__init__(model, view)
+
+    def on_timer_tick(self):
+        start = time.perf_counter()
+        super().on_timer_tick()
+        self.tick_times.append(time.perf_counter() - start)
+
+
+def bench_pipeline(app, rate_hz, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.cap")
+        sent = write_capture(path, rate_hz, seconds)
+
+        model = Model(replay_path=path, replay_speed=1.0)
+        view = PlotView()
+        controller = TimedController(model, view)
+        view.show()
+
+        start = time.perf_counter()
+        # run a little past the end so the tail of the capture gets drained
+        QTimer.singleShot(int((seconds + 0.3) * 1000), app.quit)
+        app.exec()
+        elapsed = time.perf_counter() - start
+
+        model.stop()
+        view.close()
+
+    ticks = np.array(controller.tick_times) * 1000
+    received = model.serial_rx_buffer.count
+    return {
+        "rate_hz": rate_hz,
+        "sent": sent,
+        "received": received,
+        "dropped": sent - received,
+        "overruns": model.stats.queue_overruns,
+        "decode_errors": model.stats.decode_errors + model.stats.size_errors,
+        "packets_per_s": received / min(elapsed, seconds),
+        "ticks": len(ticks),
+        "render_p50_ms": np.percentile(ticks, 50) if len(ticks) else 0.0,
+        "render_p95_ms": np.percentile(ticks, 95) if len(ticks) else 0.0,
+        "render_p99_ms": np.percentile(ticks, 99) if len(ticks) else 0.0,
+        "render_max_ms": ticks.max() if len(ticks) else 0.0,
+    }
+
+
+class TimedSerialIOHandler(SerialIOHandler):
+    """records the size of every port read and the latency of every command sent"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_sizes = []
+        self.send_latencies = []
+
+    def read_samples(self, ser):
+        before = self.stats.bytes_received
+        samples = super().read_samples(ser)
+        self.read_sizes.append(self.stats.bytes_received - before)
+        return samples
+
+    def send(self, tx_packet):
+        before = self.stats.tx_latency_ns
+        super().send(tx_packet)
+        if self.stats.tx_latency_ns != before:
+            self.send_latencies.append(self.stats.tx_latency_ns - before)
+
+
+def bench_serial(rate_hz, seconds, baudrate=None, tx_interval=0.03):
+    """read_and_send_loop against the emulator, commands go out at the Controller's rate"""
+    with McuEmulator(rate_hz=rate_hz, baudrate=baudrate, seed=0) as emulator:
+        handler = TimedSerialIOHandler()
+        handler.usb_ports = [emulator.port]
+
+        start = time.perf_counter()
+        if not handler.try_ports():
+            raise RuntimeError(f"no frames from the emulator on {emulator.port}")
+        handshake = time.perf_counter() - start
+        handler.start()
+
+        received = 0
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            handler.queue_latest_tx(TxPacket(0, int(1000 * np.sin(time.perf_counter())), 0, 0))
+            received += len(handler.rx_ring.peek())
+            handler.rx_ring.consume(len(handler.rx_ring.peek()))
+            time.sleep(tx_interval)
+        time.sleep(0.1)
+        handler.stop()
+        received += len(handler.rx_ring.peek())
+
+    reads = np.array(handler.read_sizes[1:])
+    sends = np.array(handler.send_latencies) / 1e6
+    return {
+        "rate_hz": rate_hz,
+        "baudrate": baudrate or 0,
+        "handshake_ms": handshake * 1000,
+        "sent": emulator.frames_sent,
+        "received": received,
+        "mcu_dropped": emulator.frames_dropped,
+        "decode_errors": handler.stats.decode_errors + handler.stats.size_errors,
+        "mean_read": reads.mean() if len(reads) else 0.0,
+        "commands": f"{emulator.commands_received}/{len(sends)}",
+        "latency_p50_ms": np.percentile(sends, 50) if len(sends) else 0.0,
+        "latency_p99_ms": np.percentile(sends, 99) if len(sends) else 0.0,
+    }
+
+
+def format_serial_results(results):
+    lines = [
+        f"{'rate':>7} {'baud':>7} {'hs ms':>6} {'sent':>7} {'recv':>7} {'mcu drop':>8} {'err':>5}"
+        f" {'read B':>7} {'cmds':>9} {'lat p50':>8} {'lat p99':>8}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r['rate_hz']:>7} {r['baudrate']:>7} {r['handshake_ms']:>6.0f} {r['sent']:>7} {r['received']:>7}"
+            f" {r['mcu_dropped']:>8} {r['decode_errors']:>5} {r['mean_read']:>7.0f} {r['commands']:>9}"
+            f" {r['latency_p50_ms']:>8.3f} {r['latency_p99_ms']:>8.3f}"
+        )
+    return "\n".join(lines)
+
+
+def format_results(ingest, results):
+    lines = [f"ingest only, {r['batch']} per frame: {r['packets_per_s']:.0f} packets/s" for r in ingest] + [""]
+    lines.append(
+        f"{'rate':>7} {'sent':>7} {'recv':>7} {'dropped':>7} {'ovr':>5} {'err':>5} {'pkt/s':>8}"
+        f" {'ticks':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7}"
+    )
+    for r in results:
+        lines.append(
+            f"{r['rate_hz']:>7} {r['sent']:>7} {r['received']:>7} {r['dropped']:>7} {r['overruns']:>5}"
+            f" {r['decode_errors']:>5} {r['packets_per_s']:>8.0f} {r['ticks']:>6} {r['render_p50_ms']:>7.2f}"
+            f" {r['render_p95_ms']:>7.2f} {r['render_p99_ms']:>7.2f} {r['render_max_ms']:>7.2f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--output", help="also write the results table to this file (e.g. bench_output.txt)")
+    parser.add_argument("--emulator", action="store_true", help="benchmark the serial link against mcu_emulator")
+    parser.add_argument("--baudrate", type=int, help="uart speed the emulator is throttled to")
+    args = parser.parse_args()
+
+    if args.emulator:
+        report = format_serial_results([bench_serial(rate, args.seconds, args.baudrate) for rate in args.rates])
+    else:
+        app = QApplication(sys.argv)
+        ingest = [bench_ingest(), bench_ingest(batch=RX_BATCH_MAX)]
+        results = [bench_pipeline(app, rate, args.seconds) for rate in args.rates]
+        report = format_results(ingest, results)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
@@ -0,0 +1,105 @@
+import mmap
+import struct
+import threading
+import time
+
+
+# file layout: MAGIC, then back to back records of RECORD_HEADER + payload
+MAGIC = b"STEPCAP1"
+
+# kind (u8), payload length (u32), host receive time from time.monotonic_ns (i64)
+RECORD_HEADER = struct.Struct("<BIq")
+
+RAW_RX = 1  # bytes exactly as ser.read returned them
+BLUETOOTH = 2  # one BluetoothPacket.bluetooth_dtype record
+TX = 3  # TxPacket payload before cobs encoding
+
+
+class CaptureWriter:
+    """appends records to a capture file from its own writer thread.
+
+    producers only append to an in memory chunk under a lock that is never held during
+    file I/O, the writer thread swaps the chunk out and writes it in one go. once
+    `max_pending` bytes are waiting new records are dropped and counted in `dropped`
+    rather than blocking the caller.
+    """
+
+    def __init__(self, path, max_pending=8 * 1024 * 1024, flush_interval=0.05):
+        self.path = path
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+
+        self._pending = bytearray()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.running = True
+
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def record(self, kind, payload, host_ns=None):
+        if host_ns is None:
+            host_ns = time.monotonic_ns()
+
+        with self._lock:
+            if len(self._pending) + RECORD_HEADER.size + len(payload) > self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += RECORD_HEADER.pack(kind, len(payload), host_ns)
+            self._pending += payload
+
+    def write_loop(self):
+        while self.running:
+            self._wake.wait(self.flush_interval)
+            self.flush()
+
+        self.flush()
+        self.file.close()
+
+    def flush(self):
+        with self._lock:
+            chunk, self._pending = self._pending, bytearray()
+        if chunk:
+            self.file.write(chunk)
+            self.written += len(chunk)
+
+    def close(self):
+        self.running = False
+        self._wake.set()
+        self.thread.join()
+
+
+class CaptureReader:
+    """memory maps a capture file, payloads come back as memoryviews into the map"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a capture file")
+        self.view = memoryview(self.map)
+
+    def records(self, kinds=None):
+        """yields (kind, host_ns, payload) in file order, a record cut short by a crash
+        while writing ends the iteration"""
+        offset = len(MAGIC)
+        end = len(self.map)
+        while offset + RECORD_HEADER.size <= end:
+            kind, length, host_ns = RECORD_HEADER.unpack_from(self.map, offset)
+            offset += RECORD_HEADER.size
+            if offset + length > end:
+                return
+            if kinds is None or kind in kinds:
+                yield kind, host_ns, self.view[offset : offset + length]
+            offset += length
+
+    def close(self):
+        if hasattr(self, "view"):
+            self.view.release()
+        self.map.close()
+        self.file.close()
@@ -1,18 +1,25 @@
 import time
 import numpy as np
 import scipy
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from PySide6.QtCore import QObject, Signal, Slot, QTimer, QFile
 from PySide6.QtWidgets import QWidget, QApplication
 import threading
+import multiprocessing
+from multiprocessing import shared_memory
 import serial
 from construct import Float32l, Int32ul, Int32sl, this, Struct, Enum
 from cobs import cobs
 import queue
+import selectors
+import socket
+import struct
 from collections import namedtuple
 import serial.tools.list_ports
 import pygame
 from typing import ClassVar
+import capture
+from motion_planner import SynchronizedProfile
 
 
 SystemStateField = Enum(Int32sl, OK=0, ENCODER_ERROR=1, MOTOR_ERROR=2, UNKNOWN=99)
@@ -42,19 +49,195 @@ class TxPacket:
         "commanded_speed_stepper3" / Int32sl,  # steps per seocnd
         "commanded_max_acceleration" / Int32sl,  # steps per seocnd per second
     )
+    # the same layout precompiled for the send path, construct's build is far slower
+    _layout: ClassVar[struct.Struct] = struct.Struct("<5i")
+
+    def pack_into(self, buffer, offset=0):
+        self._layout.pack_into(
+            buffer,
+            offset,
+            int(self.commanded_speed_stepper0),
+            int(self.commanded_speed_stepper1),
+            int(self.commanded_speed_stepper2),
+            int(self.commanded_speed_stepper3),
+            int(self.commanded_max_acceleration),
+        )
 
     def to_bytes(self):
-        return self._struct.build(
-            {
-                # "timestamp": 0,  # Current ms timestamp
-                "commanded_speed_stepper0": int(self.commanded_speed_stepper0),
-                "commanded_speed_stepper1": int(self.commanded_speed_stepper1),
-                "commanded_speed_stepper2": int(self.commanded_speed_stepper2),
-                "commanded_speed_stepper3": int(self.commanded_speed_stepper3),
-                "commanded_max_acceleration": int(self.commanded_max_acceleration),
-            }
+        payload = bytearray(self._layout.size)
+        self.pack_into(payload)
+        return bytes(payload)
+
+    @classmethod
+    def from_bytes(cls, raw_bytes):
+        return cls(*cls._layout.unpack(raw_bytes))
+
+
+@dataclass(slots=True)
+class TxSegment:
+    """extended TxPacket for setpoint streaming: one jerk limited change of all four
+    stepper speeds, planned on the host by SetpointStreamer.
+
+    the MCU plans a SynchronizedProfile from its own current speed and acceleration to
+    the target speeds with these per stepper acceleration limits and the shared jerk.
+    the limits are the peaks of the host's synchronized plan, so both sides land on the
+    same profile and all four steppers arrive together. the frame starts with
+    SEGMENT_TAG and is longer than a TxPacket, which is how the MCU tells them apart.
+    """
+
+    target_speed_stepper0: int = 0  # steps per second
+    target_speed_stepper1: int = 0
+    target_speed_stepper2: int = 0
+    target_speed_stepper3: int = 0
+    max_acceleration_stepper0: int = 10000  # steps per second per second
+    max_acceleration_stepper1: int = 10000
+    max_acceleration_stepper2: int = 10000
+    max_acceleration_stepper3: int = 10000
+    jerk: int = 200000  # steps per second cubed
+
+    SEGMENT_TAG: ClassVar[int] = 0x53
+    _layout: ClassVar[struct.Struct] = struct.Struct("<B4i4iI")
+
+    @property
+    def target_speeds(self):
+        return np.array(
+            [
+                self.target_speed_stepper0,
+                self.target_speed_stepper1,
+                self.target_speed_stepper2,
+                self.target_speed_stepper3,
+            ],
+            dtype=float,
         )
 
+    @property
+    def max_accelerations(self):
+        return np.array(
+            [
+                self.max_acceleration_stepper0,
+                self.max_acceleration_stepper1,
+                self.max_acceleration_stepper2,
+                self.max_acceleration_stepper3,
+            ],
+            dtype=float,
+        )
+
+    def pack_into(self, buffer, offset=0):
+        self._layout.pack_into(
+            buffer,
+            offset,
+            self.SEGMENT_TAG,
+            int(self.target_speed_stepper0),
+            int(self.target_speed_stepper1),
+            int(self.target_speed_stepper2),
+            int(self.target_speed_stepper3),
+            int(self.max_acceleration_stepper0),
+            int(self.max_acceleration_stepper1),
+            int(self.max_acceleration_stepper2),
+            int(self.max_acceleration_stepper3),
+            int(self.jerk),
+        )
+
+    def to_bytes(self):
+        payload = bytearray(self._layout.size)
+        self.pack_into(payload)
+        return bytes(payload)
+
+    @classmethod
+    def from_bytes(cls, raw_bytes):
+        tag, *fields = cls._layout.unpack(raw_bytes)
+        if tag != cls.SEGMENT_TAG:
+            raise ValueError(f"not a segment frame (tag {tag:#x})")
+        return cls(*fields)
+
+
+def parse_tx(payload):
+    """a decoded TX payload as the TxPacket or TxSegment it holds"""
+    if len(payload) == TxSegment._layout.size:
+        return TxSegment.from_bytes(payload)
+    return TxPacket.from_bytes(payload)
+
+
+class TxEncoder:
+    """turns TxPackets into delimited cobs frames for the port.
+
+    the payload is packed into one reused buffer and compared with the last one sent, a
+    command identical to it is suppressed (encode returns None) until `keepalive` seconds
+    have passed, so the MCU still hears from the host while the joystick rests.
+    keepalive=0 sends everything.
+    """
+
+    def __init__(self, keepalive=0.5):
+        self.keepalive = keepalive
+        self.payload = bytearray(TxPacket._layout.size)
+        self.last_payload = bytearray()
+        self.last_frame = None
+        self.last_sent = 0.0
+
+    def encode(self, tx_packet, now=None):
+        """works for TxPacket and TxSegment, a change of type always counts as a change"""
+        if now is None:
+            now = time.monotonic()
+        if len(self.payload) != tx_packet._layout.size:
+            self.payload = bytearray(tx_packet._layout.size)
+        tx_packet.pack_into(self.payload)
+
+        if self.last_frame is not None and self.payload == self.last_payload:
+            if now - self.last_sent < self.keepalive:
+                return None
+        else:
+            self.last_payload[:] = self.payload
+            self.last_frame = cobs.encode(self.payload) + b"\x00"
+
+        self.last_sent = now
+        return self.last_frame
+
+
+class SetpointStreamer:
+    """host side of setpoint streaming mode: turns target stepper speeds into TxSegments.
+
+    a new segment is planned only when a target moves by more than `deadband` steps per
+    second, starting from where the current plan is at that moment. in between the MCU
+    runs the plan by itself, so the link stays quiet and the motion does not depend on
+    when the commands happen to arrive.
+    """
+
+    def __init__(self, max_jerk=500000, deadband=50):
+        self.max_jerk = max_jerk
+        self.deadband = deadband
+        self.profile = None
+        self.started = 0.0
+        self.target = np.zeros(4)
+
+    def plan(self, target_speeds, max_accel, now=None):
+        """the TxSegment to send for these targets, None while the current plan stands"""
+        if now is None:
+            now = time.monotonic()
+        target = np.asarray(target_speeds, dtype=float)
+        if self.profile is not None and np.all(np.abs(target - self.target) <= self.deadband):
+            return None
+
+        if self.profile is None:
+            vel, acc = np.zeros(4), np.zeros(4)
+        else:
+            vel, acc, _ = self.profile.sample(now - self.started)
+        self.profile = SynchronizedProfile(vel, acc, target, max_accel, self.max_jerk)
+        self.started = now
+        self.target = target
+
+        # never zero: an axis with nothing to do still needs a limit the MCU can divide by
+        peaks = np.maximum(np.rint(np.abs(self.profile.peak_accel)), 1).astype(int)
+        return TxSegment(*np.rint(target).astype(int).tolist(), *peaks.tolist(), jerk=int(self.max_jerk))
+
+    def sample(self, now=None):
+        """planned (velocity, acceleration) of every stepper"""
+        if self.profile is None:
+            return np.zeros(4), np.zeros(4)
+        if now is None:
+            now = time.monotonic()
+        vel, acc, _ = self.profile.sample(now - self.started)
+        return vel, acc
+
 
 @dataclass(slots=True, frozen=True)
 class BluetoothPacket:
@@ -163,11 +346,389 @@ class RxPacket:
             dtype=self.serial_rx_dtype,
         )
 
+    # little endian layout of the payload as it comes off the wire (state is an Int32sl there)
+    serial_wire_dtype: ClassVar[np.dtype] = np.dtype(
+        [
+            ("timestamp", "<u4"),
+            ("echo_stepper0", "<i4"),
+            ("echo_stepper1", "<i4"),
+            ("echo_stepper2", "<i4"),
+            ("echo_stepper3", "<i4"),
+            ("encoder_angle", "<i4"),
+            ("open_loop_angle", "<i4"),
+            ("state", "<i4"),
+        ]
+    )
+
+    # batched rx frame: one header, then `count` samples without their own timestamps.
+    # sample i was taken at timestamp + i * period_us / 1000
+    batch_header_dtype: ClassVar[np.dtype] = np.dtype(
+        [
+            ("tag", "u1"),
+            ("count", "u1"),
+            ("period_us", "<u2"),
+            ("timestamp", "<u4"),
+        ]
+    )
+    batch_sample_dtype: ClassVar[np.dtype] = np.dtype(
+        [
+            ("echo_stepper0", "<i4"),
+            ("echo_stepper1", "<i4"),
+            ("echo_stepper2", "<i4"),
+            ("echo_stepper3", "<i4"),
+            ("encoder_angle", "<i4"),
+            ("open_loop_angle", "<i4"),
+            ("state", "u1"),
+        ]
+    )
+
     @classmethod
     def sizeof(cls):
         return cls._struct.sizeof()
 
 
+# one encoded RxPacket frame without its delimiter: cobs adds a single overhead byte
+RX_FRAME_SIZE = RxPacket.sizeof() + 1
+
+# batched frames start with this tag and hold up to RX_BATCH_MAX samples, which keeps the
+# payload under the 254 bytes the vectorized cobs code handles
+RX_BATCH_TAG = 0xBA
+RX_BATCH_MAX = (253 - RxPacket.batch_header_dtype.itemsize) // RxPacket.batch_sample_dtype.itemsize
+
+
+def rx_batch_frame_size(count):
+    """encoded size (no delimiter) of a batched frame holding count samples"""
+    return RxPacket.batch_header_dtype.itemsize + count * RxPacket.batch_sample_dtype.itemsize + 1
+
+
+RX_MAX_FRAME_SIZE = rx_batch_frame_size(RX_BATCH_MAX)
+
+DecodeResult = namedtuple("DecodeResult", ["count", "size_errors", "decode_errors"])
+
+
+def cobs_decode_frames(frames):
+    """decode a (n, width) uint8 array of cobs frames (delimiters stripped) in one pass.
+
+    every byte is treated as if it were a code byte pointing `code` bytes ahead, and the
+    chain starting at byte 0 is found for all rows at once by pointer doubling, so the
+    python loop runs log2(width) times no matter how many frames there are or how many
+    zeros they hold. only valid for payloads shorter than 254 bytes (no 0xFF blocks).
+
+    returns (payloads, ok) where payloads is (n, width - 1) and ok flags the rows whose
+    code chain landed exactly on the end of the frame.
+    """
+    n, width = frames.shape
+    end, dead = width, width + 1
+    rows = np.arange(n)[:, None]
+
+    # a zero code or one running past the frame leads into `dead`, which never gets out
+    target = np.arange(width) + frames
+    jump = np.empty((n, width + 2), dtype=np.intp)
+    jump[:, :width] = np.where((frames == 0) | (target > end), dead, target)
+    jump[:, end] = end
+    jump[:, dead] = dead
+
+    on_chain = np.zeros((n, width + 2), dtype=bool)
+    on_chain[:, 0] = True
+    reach = 1
+    while reach <= width:
+        # everything within `reach` jumps of byte 0 is marked, jump now goes `reach` ahead
+        r, c = np.nonzero(on_chain)
+        on_chain[r, jump[r, c]] = True
+        jump = jump[rows, jump]
+        reach *= 2
+
+    payloads = frames[:, 1:].copy()
+    # every code byte after the first stands in for a zero in the payload
+    payloads[on_chain[:, 1:width]] = 0
+    return payloads, on_chain[:, end]
+
+
+def cobs_encode_frames(payloads):
+    """cobs encode a (n, length) uint8 array of equal sized payloads in one pass, the
+    inverse of cobs_decode_frames. returns (n, length + 1), delimiters not included.
+
+    every zero is replaced by the distance to the next zero (or to the end), found for all
+    rows at once with a reversed running minimum over the zero positions.
+    """
+    n, length = payloads.shape
+    positions = np.arange(length + 1)
+    # a virtual zero right after the payload ends the last block
+    zero_at = np.where(np.pad(payloads, ((0, 0), (0, 1))) == 0, positions, length)
+    zero_at[:, length] = length
+    next_zero = np.minimum.accumulate(zero_at[:, ::-1], axis=1)[:, ::-1]
+
+    frames = np.empty((n, length + 1), dtype=np.uint8)
+    frames[:, 0] = next_zero[:, 0] + 1
+    frames[:, 1:] = np.where(payloads == 0, next_zero[:, 1:] - positions[:-1], payloads)
+    return frames
+
+
+def encode_frames(samples):
+    """serial_rx_dtype rows -> the zero delimited byte stream the MCU would send"""
+    wire = samples.astype(RxPacket.serial_wire_dtype)
+    payloads = wire.view(np.uint8).reshape(len(wire), RxPacket.serial_wire_dtype.itemsize)
+    frames = np.zeros((len(wire), RX_FRAME_SIZE + 1), dtype=np.uint8)
+    frames[:, :-1] = cobs_encode_frames(payloads)
+    return frames.tobytes()
+
+
+def encode_batch_frames(samples, period_us, per_frame=RX_BATCH_MAX):
+    """serial_rx_dtype rows -> a stream of batched frames, per_frame samples each (the
+    last one may hold fewer). every frame carries only its first sample's timestamp, the
+    rest follow from period_us."""
+    header_size = RxPacket.batch_header_dtype.itemsize
+    full = len(samples) - len(samples) % per_frame
+    chunks = []
+    for group in (samples[:full].reshape(-1, per_frame), samples[full:].reshape(1, -1)):
+        if group.size == 0:
+            continue
+        count = group.shape[1]
+
+        payloads = np.zeros((len(group), header_size + count * RxPacket.batch_sample_dtype.itemsize), np.uint8)
+        header = payloads[:, :header_size].view(RxPacket.batch_header_dtype)[:, 0]
+        header["tag"] = RX_BATCH_TAG
+        header["count"] = count
+        header["period_us"] = period_us
+        header["timestamp"] = group["timestamp"][:, 0]
+        body = np.zeros(group.shape, dtype=RxPacket.batch_sample_dtype)
+        for name in RxPacket.batch_sample_dtype.names:
+            body[name] = group[name]
+        payloads[:, header_size:] = body.view(np.uint8).reshape(len(group), -1)
+
+        frames = np.zeros((len(group), payloads.shape[1] + 2), dtype=np.uint8)
+        frames[:, :-1] = cobs_encode_frames(payloads)
+        chunks.append(frames.tobytes())
+    return b"".join(chunks)
+
+
+def unpack_batches(payloads):
+    """(n, width) decoded batch payloads of equal count -> serial_rx_dtype rows, in order"""
+    header_size = RxPacket.batch_header_dtype.itemsize
+    header = np.ascontiguousarray(payloads[:, :header_size]).view(RxPacket.batch_header_dtype)[:, 0]
+    body = np.ascontiguousarray(payloads[:, header_size:]).view(RxPacket.batch_sample_dtype)
+    count = body.shape[1]
+
+    rows = np.zeros(body.shape, dtype=RxPacket.serial_rx_dtype)
+    offsets = header["period_us"][:, None].astype(np.int64) * np.arange(count) // 1000
+    rows["timestamp"] = header["timestamp"][:, None] + offsets
+    for name in RxPacket.batch_sample_dtype.names:
+        rows[name] = body[name]
+    return rows.reshape(-1)
+
+
+def decode_frames(block, out):
+    """decode every zero delimited frame in `block` straight into `out`.
+
+    `block` is any bytes-like holding complete frames (each one terminated by its
+    delimiter), `out` a preallocated serial_rx_dtype array. single RxPacket frames and
+    batched frames can be mixed, rows come out in stream order. frames whose samples no
+    longer fit in `out` are dropped. no per packet python objects are created, frames
+    of one size are decoded together in one vectorized pass.
+    """
+    data = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(data == 0)
+    if len(ends) == 0:
+        return DecodeResult(0, 0, 0)
+
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts
+
+    # samples every frame would hold going by its length, 0 for sizes that are neither
+    header_size = RxPacket.batch_header_dtype.itemsize
+    batch_count, rest = np.divmod(lengths - header_size - 1, RxPacket.batch_sample_dtype.itemsize)
+    per_frame = np.where((rest == 0) & (batch_count >= 1) & (batch_count <= RX_BATCH_MAX), batch_count, 0)
+    per_frame[lengths == RX_FRAME_SIZE] = 1
+
+    # back to back delimiters are just resync padding, not errors
+    sized = per_frame > 0
+    size_errors = int(np.count_nonzero(lengths)) - int(np.count_nonzero(sized))
+
+    ok = np.zeros(len(lengths), dtype=bool)
+    groups = []
+    for width in np.unique(lengths[sized]):
+        index = np.flatnonzero(sized & (lengths == width))
+        payloads, decoded = cobs_decode_frames(data[starts[index, None] + np.arange(width)])
+        if width != RX_FRAME_SIZE:
+            header = np.ascontiguousarray(payloads[:, :header_size]).view(RxPacket.batch_header_dtype)[:, 0]
+            decoded &= (header["tag"] == RX_BATCH_TAG) & (header["count"] == per_frame[index])
+        ok[index] = decoded
+        groups.append((width, per_frame[index[0]], index[decoded], payloads[decoded]))
+
+    counts = np.where(ok, per_frame, 0)
+    offsets = np.cumsum(counts) - counts
+    fits = offsets + counts <= len(out)
+    for width, samples, index, payloads in groups:
+        keep = fits[index]
+        if width == RX_FRAME_SIZE:
+            out[offsets[index[keep]]] = payloads[keep].view(RxPacket.serial_wire_dtype).reshape(-1)
+        else:
+            rows = offsets[index[keep], None] + np.arange(samples)
+            out[rows.reshape(-1)] = unpack_batches(payloads[keep])
+
+    count = int(counts[fits].sum())
+    return DecodeResult(count, size_errors, int(np.count_nonzero(sized)) - int(np.count_nonzero(ok)))
+
+
+@dataclass(slots=True)
+class PipelineStats:
+    """running totals for the rx/tx pipeline.
+
+    every counter has exactly one writing thread, so plain `+=` under the GIL is enough
+    and the GUI can read them at any time without a lock.
+    """
+
+    frames_received: int = 0
+    bytes_received: int = 0
+    decode_errors: int = 0
+    size_errors: int = 0
+    queue_overruns: int = 0
+    joystick_evictions: int = 0
+    tx_sends: int = 0
+    tx_suppressed: int = 0
+    tx_latency_ns: int = 0  # summed over tx_sends, from queue_latest_tx to the port write
+    time: float = field(default_factory=time.monotonic)
+
+    def snapshot(self):
+        return replace(self, time=time.monotonic())
+
+    def rates(self, previous):
+        """per second rates of every counter since an earlier snapshot"""
+        dt = max(time.monotonic() - previous.time, 1e-9)
+        return {
+            "frames": (self.frames_received - previous.frames_received) / dt,
+            "bytes": (self.bytes_received - previous.bytes_received) / dt,
+            "errors": (self.decode_errors + self.size_errors - previous.decode_errors - previous.size_errors) / dt,
+            "tx": (self.tx_sends - previous.tx_sends) / dt,
+            "tx_latency_ms": (self.tx_latency_ns - previous.tx_latency_ns)
+            / max(self.tx_sends - previous.tx_sends, 1)
+            / 1e6,
+        }
+
+    def status_text(self, previous):
+        rates = self.rates(previous)
+        return (
+            f"rx {rates['frames']:.0f} fr/s {rates['bytes'] / 1000:.1f} kB/s"
+            f" | frames {self.frames_received}"
+            f" | decode err {self.decode_errors} size err {self.size_errors} ({rates['errors']:.1f}/s)"
+            f" | overruns {self.queue_overruns}"
+            f" | js evicted {self.joystick_evictions}"
+            f" | tx {self.tx_sends} ({rates['tx']:.0f}/s, {rates['tx_latency_ms']:.1f} ms,"
+            f" {self.tx_suppressed} suppressed)"
+        )
+
+
+# int64 slots in front of a shared SPSCRing: write, read, overruns, the producer's counters
+# (from slot 3 on) and, in the last slot, a stop flag for the producer process
+SHARED_HEADER_SLOTS = 16
+SHARED_STATS_FIELDS = (
+    "frames_received",
+    "bytes_received",
+    "decode_errors",
+    "size_errors",
+    "tx_sends",
+    "tx_suppressed",
+    "tx_latency_ns",
+)
+SHARED_STOP_SLOT = SHARED_HEADER_SLOTS - 1
+
+
+class SPSCRing:
+    """lock free single producer / single consumer ring of structured records.
+
+    the producer only ever moves the write index and the consumer only the read index,
+    so no lock is needed. like CircularBuffer every record is written twice, at i and
+    i + capacity, which means everything the consumer has not read yet is always one
+    contiguous slice.
+
+    overrun policy: when the consumer falls behind and the ring is full the producer
+    drops the new records (it cannot touch the ones the consumer may be reading) and
+    adds them to `overruns`.
+
+    buffer and indices can be handed in so the ring can live in memory someone else
+    owns, indices is an int64 array holding [write, read, overruns].
+    """
+
+    def __init__(self, capacity, dtype, buffer=None, indices=None):
+        self.capacity = capacity
+        self.buffer = np.zeros(2 * capacity, dtype=dtype) if buffer is None else buffer
+        self.indices = np.zeros(3, dtype=np.int64) if indices is None else indices
+
+    @classmethod
+    def shared(cls, capacity, dtype, name=None):
+        """ring living in multiprocessing.shared_memory so another process can be the
+        producer. creates the block when name is None, attaches to it otherwise.
+
+        the block starts with SHARED_HEADER_SLOTS int64s: [write, read, overruns] and room
+        for the producer to publish counters, then the mirrored records.
+        """
+        dtype = np.dtype(dtype)
+        header = SHARED_HEADER_SLOTS * 8
+        shm = shared_memory.SharedMemory(name=name, create=name is None, size=header + 2 * capacity * dtype.itemsize)
+        header_slots = np.ndarray(SHARED_HEADER_SLOTS, dtype=np.int64, buffer=shm.buf)
+        if name is None:
+            header_slots[:] = 0
+
+        ring = cls(
+            capacity,
+            dtype,
+            buffer=np.ndarray(2 * capacity, dtype=dtype, buffer=shm.buf, offset=header),
+            indices=header_slots,
+        )
+        ring.shm = shm
+        ring.owner = name is None
+        return ring
+
+    def close(self):
+        """detach from shared memory (and free it if we created it)"""
+        shm = getattr(self, "shm", None)
+        if shm is None:
+            return
+        # numpy views have to go before the block can be closed
+        self.buffer = self.indices = None
+        shm.close()
+        if self.owner:
+            shm.unlink()
+
+    @property
+    def overruns(self):
+        return int(self.indices[2])
+
+    def __len__(self):
+        return int(self.indices[0] - self.indices[1])
+
+    def write(self, records):
+        """producer side. returns how many records made it in."""
+        write, read = int(self.indices[0]), int(self.indices[1])
+        n = min(len(records), self.capacity - (write - read))
+        if n < len(records):
+            self.indices[2] += len(records) - n
+        if n == 0:
+            return 0
+
+        start = write % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[start : start + n] = records[:n]
+        self.buffer[start + self.capacity : start + self.capacity + first] = records[:first]
+        self.buffer[: n - first] = records[first:n]
+
+        # publish only once the records are in place
+        self.indices[0] = write + n
+        return n
+
+    def peek(self):
+        """consumer side. every unread record as one slice of the ring, it stays owned by
+        the consumer (and may be modified in place) until consume() is called."""
+        write, read = int(self.indices[0]), int(self.indices[1])
+        start = read % self.capacity
+        return self.buffer[start : start + write - read]
+
+    def consume(self, n):
+        self.indices[1] += n
+
+
 class BluetoothControllerHandler(QObject):
 
     bluetooth_dtype = np.dtype(
@@ -182,10 +743,14 @@ class BluetoothControllerHandler(QObject):
 
     new_bluetooth_data = Signal()
 
-    def __init__(self, start_time):
+    def __init__(self, start_time, stats=None):
         super().__init__()
         pygame.init()
 
+        self.stats = PipelineStats() if stats is None else stats
+        self.recorder = None
+        self.notify_pending = False
+
         self.running = False
         self.thread = None
         self.joystick = None
@@ -221,16 +786,29 @@ class BluetoothControllerHandler(QObject):
             pygame.event.pump()
             current_event = BluetoothPacket.from_joystick(js=self.joystick, timestamp=(time.monotonic_ns()) / 1000000)
 
+            # stop_recording can clear self.recorder from the GUI thread at any moment
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.record(capture.BLUETOOTH, current_event.as_array().tobytes())
+
             try:
                 self.q.put_nowait(current_event.as_array())
             except queue.Full:
                 _ = self.q.get_nowait()  # remove the old item
                 self.q.put_nowait(current_event.as_array())
+                self.stats.joystick_evictions += 1
 
-            self.new_bluetooth_data.emit()
+            self.notify()
 
             time.sleep(0.01)
 
+    def notify(self):
+        """emit new_bluetooth_data unless one is still queued. the receiver drains the
+        whole queue and clears notify_pending first, so no sample goes unannounced"""
+        if not self.notify_pending:
+            self.notify_pending = True
+            self.new_bluetooth_data.emit()
+
     def get_next_bluetooth_sample(self):
         try:
             return self.q.get_nowait()
@@ -248,22 +826,135 @@ class BluetoothControllerHandler(QObject):
             self.thread.join()
 
 
+class StepperPlant:
+    """acceleration limited model of the four steppers used by the sim mode.
+
+    every stepper slews towards its commanded speed at commanded_max_acceleration, like
+    the firmware ramp. with the command constant between TxPackets the motion is solved
+    in closed form, so any number of samples for all four steppers come out of one
+    vectorized call. stepper1 drives the open loop angle (steps issued) and the encoder
+    angle (lags the steps with the load and reads with a little noise).
+
+    a TxSegment switches the plant to following the synchronized jerk limited profile
+    the MCU would plan from it, until the next plain TxPacket.
+    """
+
+    def __init__(self, steps_per_rev=800 * 8, encoder_counts=4096, encoder_lag_s=0.004, encoder_noise=0.7, seed=None):
+        self.steps_per_rev = steps_per_rev
+        self.encoder_counts = encoder_counts
+        self.encoder_lag_s = encoder_lag_s
+        self.encoder_noise = encoder_noise
+        self.rng = np.random.default_rng(seed)
+
+        self.vel = np.zeros(4)  # steps per second
+        self.acc = np.zeros(4)
+        self.pos = np.zeros(4)  # steps
+        self.commanded = np.zeros(4)
+        self.max_accel = float(TxPacket().commanded_max_acceleration)
+        self.profile = None
+        self.profile_t = 0.0
+
+    def command(self, tx_packet):
+        if isinstance(tx_packet, TxSegment):
+            self.profile = SynchronizedProfile(
+                self.vel, self.acc, tx_packet.target_speeds, tx_packet.max_accelerations, tx_packet.jerk
+            )
+            self.profile_t = 0.0
+            return
+
+        self.profile = None
+        self.commanded = np.array(
+            [
+                tx_packet.commanded_speed_stepper0,
+                tx_packet.commanded_speed_stepper1,
+                tx_packet.commanded_speed_stepper2,
+                tx_packet.commanded_speed_stepper3,
+            ],
+            dtype=float,
+        )
+        self.max_accel = max(float(tx_packet.commanded_max_acceleration), 1e-9)
+
+    def advance(self, t):
+        """velocity and position of every stepper at the times t (seconds from now,
+        increasing), shaped (4, len(t)). the plant state moves on to t[-1]."""
+        if self.profile is not None:
+            return self.follow_profile(t)
+
+        t = np.asarray(t, dtype=float)[None, :]
+        v0 = self.vel[:, None]
+        target = self.commanded[:, None]
+        dv = target - v0
+
+        t_ramp = np.abs(dv) / self.max_accel
+        t_r = np.minimum(t, t_ramp)
+        accel = np.sign(dv) * self.max_accel
+
+        vel = v0 + accel * t_r
+        pos = self.pos[:, None] + v0 * t_r + 0.5 * accel * t_r**2 + target * np.maximum(t - t_ramp, 0)
+
+        self.vel = vel[:, -1].copy()
+        self.acc = np.where(t[:, -1] < t_ramp[:, 0], accel[:, 0], 0.0)
+        self.pos = pos[:, -1].copy()
+        return vel, pos
+
+    def follow_profile(self, t):
+        t = np.asarray(t, dtype=float)
+        vel, acc, _ = self.profile.evaluate(self.profile_t + t)
+
+        # trapezoid rule from the current state, plenty at the 1 ms sample spacing
+        prev = np.concatenate([self.vel[:, None], vel[:, :-1]], axis=1)
+        pos = self.pos[:, None] + np.cumsum((vel + prev) / 2 * np.diff(t, prepend=0.0), axis=1)
+
+        self.profile_t += t[-1]
+        self.vel = vel[:, -1].copy()
+        self.acc = acc[:, -1].copy()
+        self.pos = pos[:, -1].copy()
+        return vel, pos
+
+    def samples(self, timestamps_ms, t):
+        """serial_rx_dtype rows for the MCU timestamps timestamps_ms taken t seconds from now"""
+        vel, pos = self.advance(t)
+        counts_per_step = self.encoder_counts / self.steps_per_rev
+
+        rows = np.zeros(len(timestamps_ms), dtype=RxPacket.serial_rx_dtype)
+        rows["timestamp"] = timestamps_ms
+        for i in range(4):
+            rows[f"echo_stepper{i}"] = np.rint(vel[i])
+
+        open_loop = pos[1] * counts_per_step
+        encoder = (pos[1] - vel[1] * self.encoder_lag_s) * counts_per_step
+        encoder += self.rng.normal(0, self.encoder_noise, size=encoder.shape)
+        rows["open_loop_angle"] = np.rint(open_loop) % self.encoder_counts
+        rows["encoder_angle"] = np.rint(encoder) % self.encoder_counts
+        return rows
+
+
 class SerialIOHandler(QObject):
 
     new_data = Signal()  # really its a Struct
 
-    def __init__(self, baudrate: int = 115200):
+    def __init__(self, baudrate: int = 115200, stats=None):
         super().__init__()
         self.baudrate: int = baudrate
-        self.rx_q = queue.Queue(maxsize=256)
+        self.stats = PipelineStats() if stats is None else stats
+        self.recorder = None
+        self.notify_pending = False
+        self.rx_ring = SPSCRing(capacity=4096, dtype=RxPacket.serial_rx_dtype)
         self.tx_q = queue.Queue(maxsize=1)  # latest message only
+        self.tx_encoder = TxEncoder()
+        self.tx_queued_ns = 0
+        # queue_latest_tx pokes this so read_and_send_loop wakes up for a command at once.
+        # opened by start(), the only path that runs the loop in this process
+        self.tx_wake_r = self.tx_wake_w = None
         self.running = False
         self.thread = None
         self.buf = bytearray()
+        self.rx_frames = np.zeros(64, dtype=RxPacket.serial_rx_dtype)
 
-    def find_ports(self):
+    def find_ports(self, extra_ports=()):
+        """extra_ports (e.g. the pty of mcu_emulator) are tried before anything discovered"""
         possible_ports = serial.tools.list_ports.comports(include_links=False)
-        self.usb_ports = [
+        self.usb_ports = list(extra_ports) + [
             p.device
             for p in possible_ports
             if "COM" in p.device.upper() or "TTYUSB" in p.device.upper() or "TTYACM" in p.device.upper()
@@ -273,125 +964,358 @@ class SerialIOHandler(QObject):
         for usb_port in self.usb_ports:
             ser = serial.Serial(port=usb_port, baudrate=self.baudrate, timeout=0.1)
             time.sleep(0.1)
-            packet = self.read_packet(ser)
-            if packet is None:
+            self.buf.clear()
+
+            # the first frame is usually cut in half, give the port a few reads to resync
+            for _ in range(5):
+                samples = self.read_samples(ser)
+                if len(samples):
+                    break
+            else:
                 ser.close()
                 continue
-            else:
-                try:
-                    decoded = self.decode_packet(packet)
-                except cobs.DecodeError:
-                    return False
 
-                self.mcu_start_time = decoded.timestamp
-                self.computer_start_time = time.monotonic_ns()
+            self.mcu_start_time = int(samples["timestamp"][0])
+            self.computer_start_time = time.monotonic_ns()
 
-                self.port = usb_port
-                self.ser = ser
-                return True
+            self.port = usb_port
+            self.ser = ser
+            return True
 
         self.port = None
         self.ser = None
         return False
 
     def start(self):
+        self.tx_wake_r, self.tx_wake_w = socket.socketpair()
+        self.tx_wake_r.setblocking(False)
+        self.tx_wake_w.setblocking(False)
         self.running = True
         self.thread = threading.Thread(target=self.read_and_send_loop, daemon=True)
         self.thread.start()
 
-    def start_sim(self):
+    def start_process(self, poll_interval_ms=5):
+        """run serial read, cobs decode and TX in a separate process (after try_ports found
+        the port). decoded records come back through a shared memory SPSCRing, so ingest
+        keeps going no matter how busy the GUI thread is."""
+        port = self.port
+        self.ser.close()
+        self.ser = None
+
+        self.rx_ring = SPSCRing.shared(capacity=self.rx_ring.capacity, dtype=RxPacket.serial_rx_dtype)
+
+        ctx = multiprocessing.get_context("spawn")  # never fork a process that runs Qt threads
+        child_conn, self.tx_conn = ctx.Pipe(duplex=False)
+        # commands come from the GUI thread, joystick records from the bluetooth thread
+        self.tx_conn_lock = threading.Lock()
+        self.process = ctx.Process(
+            target=serial_process_main,
+            args=(port, self.baudrate, self.rx_ring.shm.name, self.rx_ring.capacity, child_conn),
+            daemon=True,
+        )
+        self.process.start()
         self.running = True
 
+        # no reader thread in this process to emit new_data, poll the ring instead
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self.poll_shared_ring)
+        self.poll_timer.start(poll_interval_ms)
+
+    def poll_shared_ring(self):
+        header = self.rx_ring.indices
+        for slot, name in enumerate(SHARED_STATS_FIELDS, start=3):
+            setattr(self.stats, name, int(header[slot]))
+        self.stats.queue_overruns = self.rx_ring.overruns
+
+        if len(self.rx_ring):
+            self.notify()
+
+        if self.running and not self.process.is_alive():
+            # the port went away (unplugged) or the process crashed, what it decoded is
+            # still in the ring but nothing more is coming and nothing can be sent
+            print(f"ingest process exited (code {self.process.exitcode}), serial port lost")
+            self.running = False
+            self.poll_timer.stop()
+
+    def reset_sim(self):
         self.init_time = int(time.time() * 1000)
-        self._sim_prev_angle = 0.0
-        self._sim_prev_open_loop_angle = 0.0
-        self.latest_tx = TxPacket()
+        self.mcu_start_time = 0
+        self.computer_start_time = time.monotonic_ns()
+        self.plant = StepperPlant()
+        self._sim_prev_now = 0
+
+    def start_sim(self):
+        self.running = True
+        self.reset_sim()
 
         self.thread = threading.Thread(target=self.sim_loop, daemon=True)
         self.thread.start()
 
+    def start_synthetic(self, rate_hz=5000, burst=50):
+        """load test source: StepperPlant samples, cobs encoded in bulk, fed through the real
+        scanner/decoder/ring path `burst` frames at a time at `rate_hz` frames per second.
+        falls behind (rather than lying about it) once the pipeline saturates, compare
+        self.generated with stats.frames_received and the overruns to find that point."""
+        self.reset_sim()
+        self.generated = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.synthetic_loop, args=(rate_hz, burst), daemon=True)
+        self.thread.start()
+
+    def synthetic_loop(self, rate_hz, burst):
+        period = burst / rate_hz
+        # plant time of every frame in a burst, counted from the last frame of the one before
+        steps = (np.arange(burst) + 1) / rate_hz
+        deadline = time.perf_counter()
+
+        while self.running:
+            if tx_packet := self.get_next_tx():
+                self.plant.command(tx_packet)
+
+            timestamps = ((self.generated + np.arange(burst)) * 1000 / rate_hz).astype(np.uint32)
+            stream = encode_frames(self.plant.samples(timestamps, steps))
+
+            decoded = self.ingest(stream)
+            if len(decoded):
+                self.publish_samples(decoded)
+            self.generated += burst
+
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def start_replay(self, path, speed=1.0):
+        """play a capture from start_recording back through the rx path.
+
+        speed scales the recorded timing (2.0 is twice as fast), None or 0 replays as
+        fast as the pipeline takes it.
+        """
+        self.reader = capture.CaptureReader(path)
+
+        self.mcu_start_time = self.first_replay_timestamp()
+        self.buf.clear()
+        self.computer_start_time = time.monotonic_ns()
+
+        self.running = True
+        self.thread = threading.Thread(target=self.replay_loop, args=(speed,), daemon=True)
+        self.thread.start()
+
+    def first_replay_timestamp(self):
+        # sync on the first sample in the capture, like try_ports does on a real port.
+        # replay_loop ingests these records again, the probe must not count them
+        stats, self.stats = self.stats, PipelineStats()
+        try:
+            for _, _, payload in self.reader.records(kinds=(capture.RAW_RX,)):
+                samples = self.ingest(payload)
+                if len(samples):
+                    return int(samples["timestamp"][0])
+            return 0
+        finally:
+            self.stats = stats
+
+    def replay_loop(self, speed):
+        first_ns = None
+        start_ns = time.monotonic_ns()
+
+        for _, host_ns, payload in self.reader.records(kinds=(capture.RAW_RX,)):
+            if not self.running:
+                break
+
+            if speed:
+                if first_ns is None:
+                    first_ns = host_ns
+                delay = (host_ns - first_ns) / speed - (time.monotonic_ns() - start_ns)
+                if delay > 0:
+                    time.sleep(delay / 1e9)
+
+            samples = self.ingest(payload)
+            if len(samples):
+                self.publish_samples(samples)
+
+            # nothing listens to commands during a replay
+            self.get_next_tx()
+
+        print("replay finished")
+
     def stop(self):
         self.running = False
         if self.thread:
             self.thread.join()
-        if hasattr(self, "ser") and self.ser.is_open:
+        if getattr(self, "process", None) is not None:
+            self.poll_timer.stop()
+            # the ingest process closes its capture on the way out, nothing left to forward
+            self.recorder = None
+            self.rx_ring.indices[SHARED_STOP_SLOT] = 1
+            self.process.join(timeout=2)
+            self.process = None
+            self.rx_ring.close()
+        if getattr(self, "reader", None) is not None:
+            self.reader.close()
+            self.reader = None
+        if getattr(self, "ser", None) is not None and self.ser.is_open:
             self.ser.close()
+        if self.tx_wake_r is not None:
+            self.tx_wake_r.close()
+            self.tx_wake_w.close()
+            self.tx_wake_r = self.tx_wake_w = None
+        self.stop_recording()
+
+    def start_recording(self, path):
+        """capture raw rx bytes and sent TxPackets to `path` until stop_recording(). with
+        start_process the ingest process writes the capture, where the port is read and
+        written, and the recorder returned here forwards other records to it."""
+        self.stop_recording()
+        if getattr(self, "process", None) is not None:
+            self.send_to_process("capture", str(path))
+            self.recorder = ProcessRecorder(self)
+        else:
+            self.recorder = capture.CaptureWriter(path)
+        return self.recorder
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
 
     def get_start_times(self) -> SyncTimes:
         return SyncTimes(self.mcu_start_time, self.computer_start_time / 1000000)
 
-    def read_and_send_loop(self):
+    def read_and_send_loop(self, poll_interval=0.001):
+        """full duplex port service: rx is decoded as soon as bytes arrive and a queued
+        command is written as soon as it is queued, neither waits on the other. where the
+        port cannot be selected on (windows) both are polled every poll_interval."""
+        selector = selectors.DefaultSelector()
+        try:
+            selector.register(self.ser.fileno(), selectors.EVENT_READ, "rx")
+            selector.register(self.tx_wakeup(), selectors.EVENT_READ, "tx")
+        except (AttributeError, OSError, ValueError):
+            selector.close()
+            selector = None
 
         while self.running:
-            packet = self.read_packet(self.ser)
-            parsed = self.decode_packet(packet)
+            if selector is not None:
+                # the timeout only bounds how long stop() waits for this loop
+                ready = {key.data for key, _ in selector.select(0.05)}
+            elif self.ser.in_waiting:
+                ready = {"rx", "tx"}
+            else:
+                ready = {"tx"}
+                time.sleep(poll_interval)
 
-            try:
-                self.rx_q.put_nowait(parsed)
-                self.new_data.emit()
-            except:
-                pass
+            if "rx" in ready:
+                samples = self.read_samples(self.ser)
+                if len(samples):
+                    self.publish_samples(samples)
 
-            if tx_packet := self.get_next_tx():
-                self.send(tx_packet)
-
-    def read_packet(self, ser: serial.Serial):
-
-        i = self.buf.find(b"\x00")
-        if i >= 0:
-            packet = self.buf[:i]
-            self.buf = self.buf[i + 1 :]
-            return packet
-        while True:
-            i = max(1, min(2048, ser.in_waiting))
-            data = ser.read(i)
-            i = data.find(b"\x00")
-            if i >= 0:
-                packet = self.buf + data[:i]
-                self.buf[0:] = data[i + 1 :]
-                return packet
-            else:
-                self.buf.extend(data)
+            if "tx" in ready:
+                self.clear_tx_wakeup()
+                if tx_packet := self.get_next_tx():
+                    self.send(tx_packet)
 
-    def rx_next_packet(self):
+        if selector is not None:
+            selector.close()
+
+    def tx_wakeup(self):
+        """what read_and_send_loop selects on to learn about queued commands"""
+        return self.tx_wake_r
+
+    def clear_tx_wakeup(self):
         try:
-            return self.rx_q.get_nowait()
-        except queue.Empty:
-            return None
+            while self.tx_wake_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def read_samples(self, ser: serial.Serial):
+        """read whatever is waiting and decode every complete frame in it at once.
+
+        returns a view into self.rx_frames, only valid until the next call. the partial
+        frame at the end stays in self.buf, corrupt or wrongly sized frames are dropped
+        and decoding picks up again at the next delimiter.
+        """
+        data = ser.read(max(1, min(2048, ser.in_waiting)))
+        recorder = self.recorder  # stop_recording may clear it from the GUI thread meanwhile
+        if recorder is not None and data:
+            recorder.record(capture.RAW_RX, data)
+        return self.ingest(data)
+
+    def ingest(self, data):
+        """feed raw bytes from any source (port, replay, generator) into the frame scanner,
+        returns the decoded samples like read_samples"""
+        self.buf.extend(data)
+        self.stats.bytes_received += len(data)
+
+        end = self.buf.rfind(b"\x00") + 1
+        if end == 0:
+            if len(self.buf) > 2 * RX_MAX_FRAME_SIZE:
+                self.buf.clear()  # line noise, no delimiter anywhere in sight
+                self.stats.size_errors += 1
+            return self.rx_frames[:0]
+
+        # batched frames pack a sample into as little as one batch_sample_dtype
+        max_rows = end // RxPacket.batch_sample_dtype.itemsize + 1
+        if len(self.rx_frames) < max_rows:
+            self.rx_frames = np.zeros(max_rows, dtype=RxPacket.serial_rx_dtype)
+
+        with memoryview(self.buf)[:end] as view:
+            result = decode_frames(view, self.rx_frames)
+        # bytearray drops a prefix by moving its start pointer, the tail is not copied
+        del self.buf[:end]
+        self.stats.size_errors += result.size_errors
+        self.stats.decode_errors += result.decode_errors
+
+        return self.rx_frames[: result.count]
+
+    def publish_samples(self, samples):
+        written = self.rx_ring.write(samples)
+        self.stats.frames_received += len(samples)
+        self.stats.queue_overruns += len(samples) - written
+        self.notify()
+
+    def notify(self):
+        """emit new_data unless one is still queued. the receiver takes everything in the
+        ring at once and clears notify_pending before it looks, so at most one signal per
+        batch sits in the Qt event queue however fast samples come in"""
+        if not self.notify_pending:
+            self.notify_pending = True
+            self.new_data.emit()
 
     def get_next_tx(self):
         try:
-            return self.tx_q.get_nowait()
+            self.tx_queued_ns, tx_packet = self.tx_q.get_nowait()
         except queue.Empty:
             return None
+        return tx_packet
 
     def queue_latest_tx(self, data_struct):
+        # monotonic_ns is system wide, the ingest process can measure latency against it too
+        item = (time.monotonic_ns(), data_struct)
+        if getattr(self, "process", None) is not None:
+            self.send_to_process("tx", item)
+            return
         try:
             self.tx_q.get_nowait()  # discard oldest item if any
         except queue.Empty:
             pass  # queue was already empty
-        self.tx_q.put_nowait(data_struct)
-
-    def decode_packet(self, packet):
-
+        self.tx_q.put_nowait(item)
+        if self.tx_wake_w is None:
+            return  # no read_and_send_loop running, the other loops poll tx_q
         try:
-            decoded = cobs.decode(packet)
-
-            if len(decoded) != RxPacket.sizeof():
-                print(
-                    f"Invalid packet size: {len(decoded)} expects: {RxPacket.sizeof()}. Packet: ",
-                    packet,
-                )
+            self.tx_wake_w.send(b"\x00")
+        except OSError:
+            pass  # plenty of wakeups pending already, or stop() just closed it
+
+    def send_to_process(self, kind, item):
+        """one (kind, item) message down the pipe to the ingest process, dropped once it
+        is gone"""
+        with self.tx_conn_lock:
+            if not self.running:
                 return
-            # consider eventually moving away from construct to pure numpy structured arrays
-            # faster plus probably more maintainable since only 1 definition
-            parsed = RxPacket.from_bytes(decoded)
-
-            # ive just added this try except without testing it.
-            return parsed
-
-        except cobs.DecodeError:
-            print(f"COBS decode error: ", packet)
+            try:
+                self.tx_conn.send((kind, item))
+            except OSError:
+                self.running = False  # died before poll_shared_ring noticed
 
     def send(self, tx_packet):
         if not hasattr(self, "ser") or self.ser is None or not self.ser.is_open:
@@ -399,10 +1323,16 @@ class SerialIOHandler(QObject):
             return
 
         try:
-            # print("send")
-            packed = tx_packet.to_bytes()
-            encoded = cobs.encode(packed) + b"\x00"  # COBS delimiter
-            self.ser.write(encoded)
+            frame = self.tx_encoder.encode(tx_packet)
+            if frame is None:
+                self.stats.tx_suppressed += 1
+                return
+            self.ser.write(frame)
+            self.stats.tx_sends += 1
+            self.stats.tx_latency_ns += time.monotonic_ns() - self.tx_queued_ns
+            recorder = self.recorder  # stop_recording may clear it from the GUI thread meanwhile
+            if recorder is not None:
+                recorder.record(capture.TX, self.tx_encoder.payload)
         except Exception as e:
             print(f"Error sending packet: {e}")
 
@@ -411,38 +1341,99 @@ class SerialIOHandler(QObject):
 
         while self.running:
             if tx_packet := self.get_next_tx():
-                self.latest_tx = tx_packet
-                # print(tx_packet)
+                self.plant.command(tx_packet)
             self.simulate_packet()
-            # self.decode_packet(packet)
 
     def simulate_packet(self):
 
         now = int(time.time() * 1000) - self.init_time
+        dt = (now - self._sim_prev_now) / 1000
+        self._sim_prev_now = now
 
-        error = self._sim_prev_angle - self._sim_prev_open_loop_angle
-
-        raw_bytes = RxPacket._struct.build(
-            dict(
-                timestamp=now,
-                echo_stepper1=self.latest_tx.commanded_speed_stepper1
-                + int(float(abs(360 * np.cos(now / 1000)) + np.random.uniform(-7, 16))),
-                echo_stepper2=self.latest_tx.commanded_speed_stepper2,
-                echo_stepper3=self.latest_tx.commanded_speed_stepper3,
-                encoder_angle=0,
-                open_loop_angle=int(self._sim_prev_open_loop_angle + error / 5),
-                state=0,
-            )
-        )
+        self.publish_samples(self.plant.samples([now], [dt]))
+        time.sleep(0.003)
 
-        parsed = RxPacket.from_bytes(raw_bytes)
 
-        self.sim_prev_angle = parsed.echo_stepper1
-        self._sim_prev_open_loop_angle = parsed.open_loop_angle
+class SerialProcessHandler(SerialIOHandler):
+    """the SerialIOHandler that runs inside the ingest process started by start_process"""
 
-        self.rx_q.put_nowait(parsed)
-        self.new_data.emit()
-        time.sleep(0.003)
+    def __init__(self, baudrate, ring, tx_conn):
+        super().__init__(baudrate=baudrate)
+        self.rx_ring = ring
+        self.tx_conn = tx_conn
+
+    def get_next_tx(self):
+        # only the newest command matters, skip anything older still in the pipe. capture
+        # control and forwarded records share the pipe and are handled on the way
+        tx_packet = None
+        while self.tx_conn.poll():
+            kind, item = self.tx_conn.recv()
+            if kind == "tx":
+                self.tx_queued_ns, tx_packet = item
+            elif kind == "capture":
+                if item is None:
+                    self.stop_recording()
+                else:
+                    self.start_recording(item)
+            elif kind == "record" and self.recorder is not None:
+                self.recorder.record(*item)
+        return tx_packet
+
+    def tx_wakeup(self):
+        # the pipe itself turns readable when the GUI process sends a command
+        return self.tx_conn
+
+    def clear_tx_wakeup(self):
+        pass
+
+    def publish_samples(self, samples):
+        # overruns are counted by the ring itself, the rest is mirrored into its header
+        self.rx_ring.write(samples)
+        self.stats.frames_received += len(samples)
+        header = self.rx_ring.indices
+        for slot, name in enumerate(SHARED_STATS_FIELDS, start=3):
+            header[slot] = getattr(self.stats, name)
+
+
+class ProcessRecorder:
+    """stands in for the CaptureWriter of the ingest process on the GUI side, records
+    (joystick samples) are forwarded to it over the command pipe"""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def record(self, kind, payload, host_ns=None):
+        if host_ns is None:
+            host_ns = time.monotonic_ns()
+        self.handler.send_to_process("record", (kind, bytes(payload), host_ns))
+
+    def close(self):
+        self.handler.send_to_process("capture", None)
+
+
+def serial_process_main(port, baudrate, ring_name, capacity, tx_conn):
+    ring = SPSCRing.shared(capacity, RxPacket.serial_rx_dtype, name=ring_name)
+    handler = SerialProcessHandler(baudrate, ring, tx_conn)
+    handler.ser = serial.Serial(port=port, baudrate=baudrate, timeout=0.1)
+    handler.running = True
+
+    # a flag in shared memory rather than a multiprocessing.Event, whose set() can hang
+    # for good if this process dies while waiting on it
+    def wait_for_stop():
+        while ring.indices[SHARED_STOP_SLOT] == 0:
+            time.sleep(0.05)
+        handler.running = False
+
+    threading.Thread(target=wait_for_stop, daemon=True).start()
+    try:
+        handler.read_and_send_loop()
+    except OSError as e:
+        # e.g. EIO once the port is unplugged, poll_shared_ring reports the exit
+        print(f"serial port lost: {e}")
+    finally:
+        handler.stop_recording()
+        handler.ser.close()
+        ring.close()
 
 
 class LowPassFilter:
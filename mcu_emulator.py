@@ -0,0 +1,194 @@
+"""firmware emulator on a pseudo terminal.
+
+opens a pty pair and speaks the MCU protocol on it: cobs framed RxPackets at a fixed rate
+out, cobs framed TxPackets and TxSegments in, with a StepperPlant standing in for the
+motors. the slave end is a real tty that pyserial, find_ports/try_ports and
+read_and_send_loop open like the usb port, e.g.
+
+    python mcu_emulator.py --rate 1000 --baudrate 115200
+    python modelviewcontroller.py --port /dev/pts/5
+
+linux/macos only (os.openpty).
+"""
+
+import argparse
+import os
+import selectors
+import threading
+import time
+import tty
+
+import numpy as np
+from cobs import cobs
+
+from gui_utils import RX_FRAME_SIZE, StepperPlant, encode_batch_frames, encode_frames, parse_tx, rx_batch_frame_size
+
+
+class McuEmulator:
+    """the firmware side of the serial link.
+
+    frames are stamped with milliseconds since boot and queued in a `tx_buffer` byte
+    transmit buffer like the firmware's uart ring. with a `baudrate` the buffer drains at
+    baudrate / 10 bytes per second, otherwise as fast as the pty takes it. frames that do
+    not fit are dropped and counted in `frames_dropped`, so a host that reads too slowly
+    shows up as drops rather than as a growing backlog.
+
+    with `batch` set, samples go out `batch` to a frame in the batched rx format instead
+    of one RxPacket frame each.
+    """
+
+    def __init__(self, rate_hz=1000, baudrate=None, boot_delay=0.0, tx_buffer=4096, batch=None, seed=None):
+        self.rate_hz = rate_hz
+        self.baudrate = baudrate
+        self.boot_delay = boot_delay
+        self.tx_buffer = tx_buffer
+        self.batch = batch
+        self.per_frame = batch or 1
+        self.frame_len = (rx_batch_frame_size(batch) if batch else RX_FRAME_SIZE) + 1
+
+        self.master, self.slave = os.openpty()
+        # no echo or line editing on bytes that arrive before pyserial configures the port
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+
+        self.plant = StepperPlant(seed=seed)
+        self.last_command = None
+
+        self.frames_dropped = 0
+        self.bytes_written = 0
+        self.commands_received = 0
+        self.command_errors = 0
+
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        os.close(self.master)
+        os.close(self.slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.master, selectors.EVENT_READ)
+        rx = bytearray()
+        pending = bytearray()
+        bytes_per_s = self.baudrate / 10 if self.baudrate else None
+
+        boot = time.monotonic()
+        # frame index counts from boot, nothing is sent until boot_delay has passed
+        next_frame = int(self.boot_delay * self.rate_hz)
+        plant_time = 0.0
+        link_budget = 0.0
+        last = boot
+
+        while self.running:
+            now = time.monotonic()
+            elapsed = now - boot
+
+            due = min(int(elapsed * self.rate_hz) + 1 - next_frame, self.rate_hz)
+            due -= due % self.per_frame  # only whole batches go out
+            if due > 0:
+                frames = next_frame + np.arange(due)
+                t = frames / self.rate_hz
+                # integer ms stamps, float t * 1000 truncates some frames a ms early.
+                # the plant takes offsets from where it is now, not per sample steps
+                samples = self.plant.samples((frames * 1000 // self.rate_hz).astype(np.uint32), t - plant_time)
+                plant_time = t[-1]
+                next_frame += due
+
+                fit = min(due, (self.tx_buffer - len(pending)) // self.frame_len * self.per_frame)
+                if fit > 0 and self.batch:
+                    pending += encode_batch_frames(samples[:fit], round(1e6 / self.rate_hz), self.batch)
+                elif fit > 0:
+                    pending += encode_frames(samples[:fit])
+                self.frames_dropped += due - max(fit, 0)
+
+            if bytes_per_s is not None:
+                link_budget = min(link_budget + (now - last) * bytes_per_s, self.tx_buffer)
+                limit = int(link_budget)
+            else:
+                limit = len(pending)
+            last = now
+
+            if pending and limit:
+                try:
+                    written = os.write(self.master, pending[:limit])
+                except BlockingIOError:
+                    written = 0
+                del pending[:written]
+                self.bytes_written += written
+                if bytes_per_s is not None:
+                    link_budget -= written
+
+            wait = (next_frame / self.rate_hz) - (time.monotonic() - boot)
+            if pending:
+                wait = min(wait, 0.001)
+            for _ in selector.select(timeout=max(0.0, min(wait, 0.01))):
+                try:
+                    rx += os.read(self.master, 4096)
+                except (BlockingIOError, OSError):
+                    continue
+                self.receive(rx)
+
+        selector.close()
+
+    @property
+    def frames_sent(self):
+        """samples handed to the pty, the host may not have read all of them yet"""
+        return self.bytes_written // self.frame_len * self.per_frame
+
+    def receive(self, rx):
+        """apply every complete command frame in rx and drop it from the buffer"""
+        end = rx.rfind(b"\x00") + 1
+        if end == 0:
+            return
+        for frame in bytes(rx[: end - 1]).split(b"\x00"):
+            try:
+                self.last_command = parse_tx(cobs.decode(frame))
+            except Exception:
+                self.command_errors += 1
+                continue
+            self.plant.command(self.last_command)
+            self.commands_received += 1
+        del rx[:end]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=int, default=1000, help="RxPackets per second")
+    parser.add_argument("--baudrate", type=int, help="throttle the link to this uart speed")
+    parser.add_argument("--boot-delay", type=float, default=0.0, help="seconds of silence before the first frame")
+    parser.add_argument("--batch", type=int, help="samples per batched rx frame (1-9), single frames if unset")
+    args = parser.parse_args()
+
+    emulator = McuEmulator(
+        rate_hz=args.rate, baudrate=args.baudrate, boot_delay=args.boot_delay, batch=args.batch
+    ).start()
+    print(f"emulating the MCU on {emulator.port}, ctrl-c to stop")
+    try:
+        while True:
+            time.sleep(1)
+            print(
+                f"{emulator.frames_sent} frames sent, {emulator.frames_dropped} dropped,"
+                f" {emulator.commands_received} commands ({emulator.command_errors} bad)"
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
@@ -7,9 +7,18 @@ import numpy as np
 
 
 from dataclasses import dataclass
-from PySide6.QtCore import QObject, Slot, QTimer, QFile
+from PySide6.QtCore import QObject, Signal, Slot, QTimer, QFile
 from PySide6.QtWidgets import QWidget, QApplication, QGraphicsEllipseItem
-from gui_utils import SerialIOHandler, BluetoothControllerHandler, LowPassFilter, RxPacket, TxPacket, BluetoothPacket
+from gui_utils import (
+    SerialIOHandler,
+    BluetoothControllerHandler,
+    LowPassFilter,
+    RxPacket,
+    TxPacket,
+    BluetoothPacket,
+    PipelineStats,
+    SetpointStreamer,
+)
 import queue
 
 import pygame
@@ -19,6 +28,31 @@ import sys
 generated_class, base_class = pg.Qt.loadUiType("bluetooth.ui")
 
 
+def minmax_decimate(x, y, bins):
+    """reduce a curve to at most about 2 * bins points for drawing.
+
+    the samples are split into `bins` runs and each run keeps its smallest and largest
+    y, in the order they occur, so spikes and the envelope look the same as with every
+    sample drawn. curves already short enough come back untouched.
+    """
+    n = len(y)
+    if n <= 2 * bins:
+        return x, y
+
+    per_bin = -(-n // bins)
+    full = n // per_bin
+    runs = y[: full * per_bin].reshape(full, per_bin)
+    offsets = np.arange(full)[:, None] * per_bin
+    picks = np.sort(np.stack([runs.argmin(axis=1), runs.argmax(axis=1)], axis=1), axis=1) + offsets
+    picks = picks.reshape(-1)
+
+    if full * per_bin < n:
+        tail = y[full * per_bin :]
+        ends = np.sort([tail.argmin(), tail.argmax()]) + full * per_bin
+        picks = np.concatenate([picks, ends])
+    return x[picks], y[picks]
+
+
 class PlotView(base_class, generated_class):
     """model view controller framework view,
     imports UI from testing.ui"""
@@ -93,18 +127,23 @@ class PlotView(base_class, generated_class):
         #     name="fft1",
         # )
 
-    def update_bluetooth(self, bluetooth_data, speed1_scale, speed23_scale):
+    def update_bluetooth(self, bluetooth_data, speed1_scale, speed23_scale, history=None):
 
-        axis0 = bluetooth_data["left_horiz"][-3:]
+        # pyqtgraph keeps what it is given, the buffer views would change under it
+        axis0 = bluetooth_data["left_horiz"][-3:].copy()
         axis1 = -bluetooth_data["left_vert"][-3:]
-        axis2 = bluetooth_data["right_horiz"][-3:]
+        axis2 = bluetooth_data["right_horiz"][-3:].copy()
         axis3 = -bluetooth_data["right_vert"][-3:]
 
         self.plot_left_knob.setData(axis0, axis1)
         self.plot_right_knob.setData(axis2, axis3)
-        self.plot_command.setData(
-            bluetooth_data["timestamp"], (-bluetooth_data["left_vert"] * speed1_scale).astype(int)
-        )
+        records = self.history_records(history, bluetooth_data)
+        if records is None:
+            self.set_linear_curve(
+                self.plot_command, bluetooth_data["timestamp"], (-bluetooth_data["left_vert"] * speed1_scale).astype(int)
+            )
+        else:
+            self.set_envelope_curve(self.plot_command, records, "left_vert", -speed1_scale)
 
     def update_fft(self, fft_tuple):
         length = len(fft_tuple[0]) / 2
@@ -112,9 +151,13 @@ class PlotView(base_class, generated_class):
 
         # self.plot_fft.setData(fft_freq, fft_data)
 
-    def update_serial(self, rx_data, speed0_scale, speed1_scale, speed23_scale):
+    def update_serial(self, rx_data, speed0_scale, speed1_scale, speed23_scale, history=None):
 
-        self.plot_echo.setData(rx_data["timestamp"], -rx_data["echo_stepper1"])
+        records = self.history_records(history, rx_data)
+        if records is None:
+            self.set_linear_curve(self.plot_echo, rx_data["timestamp"], -rx_data["echo_stepper1"])
+        else:
+            self.set_envelope_curve(self.plot_echo, records, "echo_stepper1", -1)
         self.plot_left_knob_echo.setData(
             rx_data["echo_stepper0"][-3:] / (speed0_scale + 0.01),
             -rx_data["echo_stepper1"][-3:] / (speed1_scale + 0.01),
@@ -130,6 +173,41 @@ class PlotView(base_class, generated_class):
         #     rx_data["echo_stepper2"][-3:] * 1.0 / (8.0 * 600.0), rx_data["echo_stepper3"][-3:] * 1.0 / (8.0 * 600.0)
         # )
 
+    def set_linear_curve(self, curve, x, y):
+        """hand a curve of the linear plot only the samples in view, min/max decimated to
+        about two points per horizontal pixel, so long histories draw at a constant cost.
+        x has to be increasing."""
+        view = self.linear_plot_widget.getViewBox()
+        if not view.autoRangeEnabled()[0]:
+            # one sample either side keeps the line running to the edges
+            lo, hi = view.viewRange()[0]
+            start = max(int(np.searchsorted(x, lo)) - 1, 0)
+            stop = int(np.searchsorted(x, hi, side="right")) + 1
+            x, y = x[start:stop], y[start:stop]
+
+        x, y = minmax_decimate(x, y, max(int(view.width()), 1))
+        # short curves come back undecimated as views into the buffer, which pyqtgraph
+        # would keep and the next push would overwrite under it
+        curve.setData(np.array(x), np.array(y))
+
+    def history_records(self, history, data):
+        """records of a HistoryStore for the x range in view, None unless the linear plot
+        is panned or zoomed back past the plotted window"""
+        view = self.linear_plot_widget.getViewBox()
+        if history is None or view.autoRangeEnabled()[0] or len(data) == 0:
+            return None
+        lo, hi = view.viewRange()[0]
+        if lo >= data["timestamp"][0]:
+            return None
+        return history.query(lo, hi, max_points=2 * max(int(view.width()), 1))
+
+    def set_envelope_curve(self, curve, records, field, scale):
+        """draw the min/max envelope of one field of HistoryStore records, a vertical
+        stroke per record"""
+        x = np.repeat(records["timestamp"], 2)
+        y = np.column_stack([records[f"{field}_min"], records[f"{field}_max"]]).ravel() * scale
+        self.set_linear_curve(curve, x, y)
+
     def update_labels(self):
         self.speed0_label.setText(f"Speed0: {self.speed0_scale_dial.value()}")
         self.speed1_label.setText(f"Speed1: {self.speed1_scale_slider.value()}")
@@ -138,19 +216,31 @@ class PlotView(base_class, generated_class):
 
 
 class Controller(QObject):
-    def __init__(self, model, view):
+    def __init__(self, model, view, max_fps=60):
         super().__init__()
         self.model = model
         self.view = view
 
+        # renders are driven by model.data_changed: one per burst of data, at most
+        # max_fps a second, and none at all while nothing comes in
+        self.frame_interval = 1 / max_fps
+        self.last_render = 0.0
         self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.on_timer_tick)
-        self.timer.start(15)
+        self.model.data_changed.connect(self.request_render)
+        # panning or zooming changes what is in view, the curves are cut to it
+        self.view.linear_plot_widget.getViewBox().sigXRangeChanged.connect(self.on_view_changed)
 
         self.tx_timer = QTimer(self)
         self.tx_timer.start(30)
         self.tx_timer.timeout.connect(self.model.send_packet)
 
+        self.prev_stats = self.model.stats.snapshot()
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.on_stats_tick)
+        self.stats_timer.start(500)
+
         self.view.acceleration_slider.setValue(self.model.acceleration)
         self.view.speed0_scale_dial.setValue(self.model.speed0_scale)
         self.view.speed1_scale_slider.setValue(self.model.speed1_scale)
@@ -172,45 +262,115 @@ class Controller(QObject):
         self.model.speed23_scale = self.view.speed23_scale_slider.value()
         self.model.acceleration = self.view.acceleration_slider.value()
 
+        # the scales change how both plots are drawn
+        self.model.serial_dirty = self.model.bluetooth_dirty = True
+        self.request_render()
+
+    def on_view_changed(self):
+        if self.view.linear_plot_widget.getViewBox().autoRangeEnabled()[0]:
+            return  # the range just followed the data that was drawn
+        self.model.serial_dirty = self.model.bluetooth_dirty = True
+        self.request_render()
+
+    def request_render(self):
+        if self.timer.isActive():
+            return  # a render is already scheduled and will pick this up
+        delay = self.last_render + self.frame_interval - time.monotonic()
+        self.timer.start(max(0, int(delay * 1000)))
+
     def on_timer_tick(self):
+        self.last_render = time.monotonic()
 
         # self.view.update_fft(self.model.update_fft())
 
-        bluetooth_data = self.model.get_bluetooth_data()
-        echo_data = self.model.get_serial_data()
+        if self.model.bluetooth_dirty:
+            self.model.bluetooth_dirty = False
+            bluetooth_data = self.model.get_bluetooth_data()
+            self.view.update_bluetooth(
+                bluetooth_data, self.model.speed1_scale, self.model.speed23_scale, self.model.bluetooth_history
+            )
 
-        self.view.update_bluetooth(bluetooth_data, self.model.speed1_scale, self.model.speed23_scale)
-        self.view.update_serial(echo_data, self.model.speed0_scale, self.model.speed1_scale, self.model.speed23_scale)
+        if self.model.serial_dirty:
+            self.model.serial_dirty = False
+            echo_data = self.model.get_serial_data()
+            self.view.update_serial(
+                echo_data,
+                self.model.speed0_scale,
+                self.model.speed1_scale,
+                self.model.speed23_scale,
+                self.model.serial_history,
+            )
+            self.view.state_label.setText(f"state: {self.model.echoed_speed:.2f}")
 
-        self.view.state_label.setText(f"state: {self.model.echoed_speed:.2f}")
+    def on_stats_tick(self):
+
+        self.view.statusbar.showMessage(self.model.stats.status_text(self.prev_stats))
+        self.prev_stats = self.model.stats.snapshot()
 
 
 class Model(QObject):
 
-    def __init__(self):
+    # new samples went into a buffer, the matching *_dirty flag says which one
+    data_changed = Signal()
+
+    def __init__(
+        self,
+        replay_path=None,
+        replay_speed=1.0,
+        ingest_process=False,
+        synthetic_rate=None,
+        synthetic_burst=50,
+        serial_port=None,
+        stream_setpoints=False,
+    ):
         super().__init__()
 
         self.mcu_state = "NODATA"
         self.echoed_speed = 0
+        self.serial_dirty = False
+        self.bluetooth_dirty = False
         self.prev_time = 0
-        self.io_handler = SerialIOHandler(baudrate=115200)
+        self.stats = PipelineStats()
+        self.io_handler = SerialIOHandler(baudrate=115200, stats=self.stats)
+
+        # how many of the newest samples get plotted. the buffers keep a lot more history
+        # than that, snapshots are views so their size does not change the render cost
+        self.bluetooth_window = 118
+        self.serial_window = 256
 
         # bluetooth dtype can be found in bluetoothhandler. just has joystick axis data
-        self.bluetooth_buffer = CircularBuffer(size=118, dtype=BluetoothPacket.bluetooth_dtype)
+        self.bluetooth_buffer = CircularBuffer(size=16 * self.bluetooth_window, dtype=BluetoothPacket.bluetooth_dtype)
 
-        self.serial_rx_buffer = CircularBuffer(size=256, dtype=RxPacket.serial_rx_dtype)
+        self.serial_rx_buffer = CircularBuffer(size=16 * self.serial_window, dtype=RxPacket.serial_rx_dtype)
+
+        # downsampled min/mean/max levels behind the buffers, what the linear plot draws
+        # once it is zoomed or panned back past them
+        self.serial_history = HistoryStore(
+            self.serial_rx_buffer, fields=("echo_stepper0", "echo_stepper1", "echo_stepper2", "echo_stepper3")
+        )
+        self.bluetooth_history = HistoryStore(
+            self.bluetooth_buffer, fields=("left_horiz", "left_vert", "right_horiz", "right_vert")
+        )
 
         self.io_handler.new_data.connect(self.update)
 
-        self.io_handler.find_ports()
-        if self.io_handler.try_ports() is True:
-            self.io_handler.start()
-            self.sync_times = self.io_handler.get_start_times()
+        if replay_path:
+            self.io_handler.start_replay(replay_path, speed=replay_speed)
+        elif synthetic_rate:
+            self.io_handler.start_synthetic(rate_hz=synthetic_rate, burst=synthetic_burst)
         else:
-            print("no usb port penis")
-            self.io_handler.start_sim()
-
-        self.bluetooth_handler = BluetoothControllerHandler(start_time=self.sync_times.host_ms)
+            self.io_handler.find_ports(extra_ports=[serial_port] if serial_port else ())
+            if self.io_handler.try_ports() is True:
+                if ingest_process:
+                    self.io_handler.start_process()
+                else:
+                    self.io_handler.start()
+            else:
+                print("no usb port penis")
+                self.io_handler.start_sim()
+        self.sync_times = self.io_handler.get_start_times()
+
+        self.bluetooth_handler = BluetoothControllerHandler(start_time=self.sync_times.host_ms, stats=self.stats)
         self.bluetooth_handler.new_bluetooth_data.connect(self.update_bluetooth)
         self.bluetooth_handler.start()
 
@@ -222,16 +382,40 @@ class Model(QObject):
         self.speed23_scale = 800 * 8
         self.acceleration = 50000
 
+        # setpoint streaming: the host plans jerk limited segments instead of sending raw speeds
+        self.streamer = SetpointStreamer() if stream_setpoints else None
+
+    def stop(self):
+        self.bluetooth_handler.stop()
+        self.io_handler.stop()
+
+    def start_recording(self, path):
+        """record the raw serial stream, joystick samples and sent TxPackets to one file"""
+        recorder = self.io_handler.start_recording(path)
+        self.bluetooth_handler.recorder = recorder
+
+    def stop_recording(self):
+        self.bluetooth_handler.recorder = None
+        self.io_handler.stop_recording()
+
     def update(self):
 
         # this direction logic is to give more intuitive control to motors 2 and 3.
 
-        while (rx_packet := self.io_handler.rx_next_packet()) is not None:
-            rx_packet_arr = rx_packet.as_array()
+        # everything the reader thread published since last time, as one slice of the ring.
+        # the flag is cleared first so anything published from here on signals again
+        self.io_handler.notify_pending = False
+        samples = self.io_handler.rx_ring.peek()
+        if len(samples) == 0:
+            return
 
-            rx_packet_arr["timestamp"] = rx_packet_arr["timestamp"] - self.sync_times.mcu_ms
+        samples["timestamp"] -= self.sync_times.mcu_ms
+        self.serial_rx_buffer.push_many(samples)
+        self.serial_history.append(samples)
+        self.io_handler.rx_ring.consume(len(samples))
 
-            self.serial_rx_buffer.push(rx_packet_arr)
+        self.serial_dirty = True
+        self.data_changed.emit()
 
     def update_fft(self):
         sampling_rate = 200
@@ -242,19 +426,30 @@ class Model(QObject):
 
     def get_serial_data(self):
 
-        return self.serial_rx_buffer.get_all()
+        return self.serial_rx_buffer.get_last(self.serial_window)
 
     def update_bluetooth(self):
 
         # empty bluetooth queue into circular buffer
         # walrus operator is evaluation and asignment aT THE SAME TIME
+        self.bluetooth_handler.notify_pending = False
+        samples = []
         while (sample := self.bluetooth_handler.get_next_bluetooth_sample()) is not None:
-            sample["timestamp"] = sample["timestamp"] - self.sync_times.host_ms + 96
-            self.bluetooth_buffer.push(sample)
+            samples.append(sample)
+        if not samples:
+            return
+
+        samples = np.array(samples, dtype=BluetoothPacket.bluetooth_dtype)
+        samples["timestamp"] = samples["timestamp"] - self.sync_times.host_ms + 96
+        self.bluetooth_buffer.push_many(samples)
+        self.bluetooth_history.append(samples)
+
+        self.bluetooth_dirty = True
+        self.data_changed.emit()
 
     def get_bluetooth_data(self):
 
-        return self.bluetooth_buffer.get_all()
+        return self.bluetooth_buffer.get_last(self.bluetooth_window)
 
     def send_packet(self, speed0=0, speed1=0, speed2=0, speed3=0):
 
@@ -271,6 +466,17 @@ class Model(QObject):
 
         # self.filtered_speed1 = speed1
 
+        if self.streamer is not None:
+            targets = [
+                self.speed0_scale * speed0,
+                self.speed1_scale * speed1,
+                self.speed23_scale * speed2,
+                self.speed23_scale * speed3,
+            ]
+            if (segment := self.streamer.plan(targets, self.acceleration)) is not None:
+                self.io_handler.queue_latest_tx(segment)
+            return
+
         tx_packet = TxPacket()
         tx_packet.commanded_speed_stepper0 = int(self.speed0_scale * speed0)
         tx_packet.commanded_speed_stepper1 = int(self.speed1_scale * speed1)
@@ -282,43 +488,198 @@ class Model(QObject):
 
 
 class CircularBuffer:
+    """ring buffer that writes every sample twice, at i and i + size.
+
+    because of the mirror the last `size` samples always sit contiguous somewhere in
+    self.buffer, so snapshots are plain slices instead of np.roll copies and cost the
+    same no matter how big the buffer is.
+    """
+
     def __init__(self, size, dtype):
-        self.buffer = np.zeros(size, dtype=dtype)
+        self.buffer = np.zeros(2 * size, dtype=dtype)
         self.index = -1
         self.size = size
+        self.count = 0  # total samples ever written, lets readers tell if anything new arrived
 
     def push(self, val):
         self.index = (self.index + 1) % self.size
         self.buffer[self.index] = val
+        self.buffer[self.index + self.size] = val
+        self.count += 1
+
+    def push_many(self, values):
+        """write a whole array of samples, wrap around and mirror included in three slice
+        assignments. returns how many samples were handed in."""
+        n = len(values)
+        if n == 0:
+            return 0
+
+        # only the newest `size` samples can survive anyway
+        values = values[-self.size :]
+        m = len(values)
+
+        # skipped samples still advance the write position
+        start = (self.index + 1 + n - m) % self.size
+        first = min(m, self.size - start)
+        self.buffer[start : start + m] = values
+        self.buffer[start + self.size : start + self.size + first] = values[:first]
+        self.buffer[: m - first] = values[first:]
+
+        self.index = (start + m - 1) % self.size
+        self.count += n
+        return n
 
     def get_latest(self):
 
         return self.buffer[self.index]
 
+    def get_last(self, n):
+        """read only view of the newest n samples, oldest first. no copy is made, so it
+        is only valid until the next push."""
+        n = min(n, self.size)
+        end = self.index + 1 + self.size
+        view = self.buffer[end - n : end]
+        view.flags.writeable = False
+        return view
+
     def get_all(self):
 
-        return np.roll(self.buffer, -self.index - 1)
+        return self.get_last(self.size)
 
 
-def application():
+class HistoryStore:
+    """downsampled history behind a CircularBuffer of raw samples.
+
+    level 0 is the raw buffer itself. every further level keeps one record per `factor`
+    records of the level below it: the first timestamp and the min, mean and max of
+    each field in `fields`. levels are fixed size rings, so memory stays bounded while
+    each level reaches `factor` times further back than the one before (with the
+    defaults and 1 kHz data: 65 s, 17 min and 4.6 h). append() only reduces the newly
+    completed buckets, the leftover of a bucket waits in `pending` for the next call.
+    """
+
+    STATS = ("min", "mean", "max")
+
+    def __init__(self, raw, fields, factor=16, levels=3, level_size=4096):
+        self.raw = raw
+        self.fields = fields
+        self.factor = factor
+        self.dtype = np.dtype(
+            [("timestamp", np.float64)] + [(f"{f}_{stat}", np.float32) for f in fields for stat in self.STATS]
+        )
+        self.levels = [CircularBuffer(size=level_size, dtype=self.dtype) for _ in range(levels)]
+        self.pending = [np.zeros(0, dtype=self.dtype) for _ in range(levels)]
+
+    def as_summary(self, samples):
+        """raw samples as records of the summary dtype, min = mean = max"""
+        records = np.zeros(len(samples), dtype=self.dtype)
+        records["timestamp"] = samples["timestamp"]
+        for f in self.fields:
+            for stat in self.STATS:
+                records[f"{f}_{stat}"] = samples[f]
+        return records
+
+    def append(self, samples):
+        """fold newly buffered raw samples into the levels, call after raw.push_many"""
+        records = self.as_summary(samples)
+        for level, buffer in enumerate(self.levels):
+            records = np.concatenate([self.pending[level], records])
+            full = len(records) // self.factor * self.factor
+            self.pending[level] = records[full:].copy()
+            if full == 0:
+                return
+
+            buckets = records[:full].reshape(-1, self.factor)
+            records = np.zeros(len(buckets), dtype=self.dtype)
+            records["timestamp"] = buckets["timestamp"][:, 0]
+            for f in self.fields:
+                records[f"{f}_min"] = buckets[f"{f}_min"].min(axis=1)
+                records[f"{f}_mean"] = buckets[f"{f}_mean"].mean(axis=1)
+                records[f"{f}_max"] = buckets[f"{f}_max"].max(axis=1)
+            buffer.push_many(records)
+
+    def query(self, start, end, max_points):
+        """summary records between the timestamps start and end from the finest level
+        that reaches back to start without going over max_points records (the coarsest
+        level if none does)"""
+        candidates = [self.as_summary(self.raw.get_last(min(self.raw.count, self.raw.size)))]
+        candidates += [buffer.get_last(min(buffer.count, buffer.size)) for buffer in self.levels]
+
+        for i, records in enumerate(candidates):
+            lo = int(np.searchsorted(records["timestamp"], start))
+            hi = int(np.searchsorted(records["timestamp"], end, side="right"))
+            coarsest = i == len(candidates) - 1
+            reaches_back = len(records) and records["timestamp"][0] <= start
+            if coarsest or (reaches_back and hi - lo <= max_points):
+                # one record either side keeps the line running to the edges
+                return records[max(lo - 1, 0) : hi + 1]
+
+
+def application(
+    record_path=None,
+    replay_path=None,
+    replay_speed=1.0,
+    ingest_process=False,
+    synthetic_rate=None,
+    synthetic_burst=50,
+    serial_port=None,
+    stream_setpoints=False,
+):
     import sys
 
     app = QApplication(sys.argv)
-    model = Model()
+    model = Model(
+        replay_path=replay_path,
+        replay_speed=replay_speed,
+        ingest_process=ingest_process,
+        synthetic_rate=synthetic_rate,
+        synthetic_burst=synthetic_burst,
+        serial_port=serial_port,
+        stream_setpoints=stream_setpoints,
+    )
+    if record_path:
+        model.start_recording(record_path)
     view = PlotView()
     controller = Controller(model, view)
 
     view.show()
 
-    sys.exit(app.exec())  # Run Qt event loop
+    exit_code = app.exec()  # Run Qt event loop
+    model.stop()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
+    import argparse
     import cProfile
     import pstats
     import signal
 
-    application()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", metavar="PATH", help="capture the serial stream to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="play a capture back instead of opening a port")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 0 for as fast as possible")
+    parser.add_argument(
+        "--ingest-process", action="store_true", help="read and decode the serial port in a separate process"
+    )
+    parser.add_argument(
+        "--synthetic", type=float, metavar="RATE", help="load test with RATE simulated frames per second"
+    )
+    parser.add_argument("--burst", type=int, default=50, help="frames per synthetic write")
+    parser.add_argument("--port", help="try this serial port (e.g. the mcu_emulator pty) before the usb ones")
+    parser.add_argument("--stream", action="store_true", help="send planned jerk limited segments, not raw speeds")
+    args, _ = parser.parse_known_args()
+
+    application(
+        record_path=args.record,
+        replay_path=args.replay,
+        replay_speed=args.speed,
+        ingest_process=args.ingest_process,
+        synthetic_rate=args.synthetic,
+        synthetic_burst=args.burst,
+        serial_port=args.port,
+        stream_setpoints=args.stream,
+    )
     # signal.signal(signal.SIGINT, signal.SIG_DFL)
     # cProfile.run("application()", "profile_output.prof")
     # p = pstats.Stats("profile_output.prof")
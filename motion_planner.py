@@ -1,7 +1,7 @@
-import matplotlib.pyplot as plt
 import math
 import numpy
 import scipy
+from collections import namedtuple
 
 
 class Motor:
@@ -17,6 +17,52 @@ class Motor:
         self.pos = self.pos + self.vel
 
 
+SimResult = namedtuple("SimResult", ["pos", "vel", "accel"])
+
+
+def simulate_motors(vel_commands=None, accel_commands=None, dt=1.0, start_pos=0.0, start_vel=0.0):
+    """integrate N motors for T steps at once, the batched version of looping Motor.update.
+
+    pass either per motor velocity commands or acceleration commands, shaped (N, T) (a
+    single (T,) profile is treated as one motor). start_pos / start_vel are scalars or
+    per motor arrays. returns SimResult of (N, T) position, velocity and acceleration
+    arrays, each step ordered like the Motor loop: position moves with the velocity from
+    the step before, then the new velocity applies.
+    """
+    if (vel_commands is None) == (accel_commands is None):
+        raise ValueError("pass exactly one of vel_commands or accel_commands")
+
+    commands = numpy.atleast_2d(numpy.asarray(vel_commands if accel_commands is None else accel_commands, dtype=float))
+    n, steps = commands.shape
+    start_pos = numpy.broadcast_to(numpy.asarray(start_pos, dtype=float), (n,))
+    start_vel = numpy.broadcast_to(numpy.asarray(start_vel, dtype=float), (n,))
+
+    pos = numpy.empty((n, steps))
+    vel = numpy.empty((n, steps))
+    accel = numpy.empty((n, steps))
+
+    if accel_commands is None:
+        vel[:] = commands
+        # acceleration that got each motor from its previous velocity to the commanded one
+        accel[:, 0] = (vel[:, 0] - start_vel) / dt
+        numpy.subtract(vel[:, 1:], vel[:, :-1], out=accel[:, 1:])
+        accel[:, 1:] /= dt
+        # position lags the velocity command by one step
+        pos[:, 0] = start_vel
+        pos[:, 1:] = vel[:, :-1]
+    else:
+        accel[:] = commands
+        numpy.cumsum(accel, axis=1, out=vel)
+        vel *= dt
+        vel += start_vel[:, None]
+        pos[:] = vel
+
+    numpy.cumsum(pos, axis=1, out=pos)
+    pos *= dt
+    pos += start_pos[:, None]
+    return SimResult(pos, vel, accel)
+
+
 def ramp_velocity(t, start_vel=0, target_vel=30, max_accel=10):
     dv = target_vel - start_vel
     if dv == 0:
@@ -32,56 +78,275 @@ def ramp_velocity(t, start_vel=0, target_vel=30, max_accel=10):
 
 
 def s_curve_velocity(t, start_vel, start_accel, target_vel, max_accel, max_jerk):
-    v_error = target_vel - start_vel
-    direction = math.copysign(1, v_error)
-
-    max_accel *= direction
-    max_jerk *= direction
-
-    v_min = (start_accel**2 + max_accel**2) / (2 * abs(max_jerk))
-    if abs(v_error) < abs(v_min):
-        peak_accel = math.sqrt(abs(v_error) * abs(max_jerk) + 0.5 * start_accel**2) * direction
-        t_acc = (peak_accel - start_accel) / max_jerk
-        t_cruise = 0.0
-        t_dec = peak_accel / max_jerk
-        t_total = t_acc + t_dec
-        peak_accel_val = peak_accel
-        # triangle
-    else:
-        t_acc = (max_accel - start_accel) / max_jerk
-        t_dec = max_accel / max_jerk
-        v_acc = (start_accel + max_accel) * t_acc * 0.5
-        v_dec = max_accel * 0.5 * t_dec
-        v_cruise = v_error - v_acc - v_dec
-        t_cruise = v_cruise / max_accel
-        t_total = t_acc + t_dec + t_cruise
-        peak_accel_val = max_accel
-        # trapezoid
+    # solving the phases every call is wasteful, keep an SCurveProfile around when sampling
+    # the same profile repeatedly
+    return SCurveProfile(start_vel, start_accel, target_vel, max_accel, max_jerk).velocity(t)
+
+
+def ramp_profile(t, start_vel=0, target_vel=30, max_accel=10):
+    """ramp_velocity for a whole array of times at once.
+    returns (velocity, acceleration, jerk) arrays shaped like t."""
+    t = numpy.asarray(t, dtype=float)
+    dv = target_vel - start_vel
+    if dv == 0:
+        return numpy.full_like(t, target_vel), numpy.zeros_like(t), numpy.zeros_like(t)
+
+    accel = max_accel if dv > 0 else -max_accel
+    t_ramp = dv / accel
+
+    ramping = t < t_ramp
+    vel = numpy.where(ramping, start_vel + accel * t, target_vel)
+    acc = numpy.where(ramping, accel, 0.0)
+    return vel, acc, numpy.zeros_like(t)
+
+
+def s_curve_phases(start_vel, start_accel, target_vel, max_accel, max_jerk):
+    """phase durations of a jerk limited velocity change, elementwise over numpy arrays.
+
+    returns (t_acc, t_cruise, t_dec, peak_accel, jerk) with jerk the jerk of the first
+    phase. when the change is too small to reach max_accel the profile is a triangle
+    (t_cruise == 0) with a lower peak. a start_accel above max_accel is brought down to
+    it first. when start_accel alone would carry the velocity past the target (ramping
+    it to zero covers more than the change) the overshoot can not be avoided at this
+    jerk: the peak is on the other side of zero and the velocity comes back to the
+    target from beyond it.
+    """
+    v_error = numpy.subtract(target_vel, start_vel, dtype=float)
+    direction = numpy.where(v_error < 0, -1.0, 1.0)
+
+    # work in the direction of travel so the limits are all positive
+    dv = numpy.abs(v_error)
+    a0 = start_accel * direction
+    max_accel = numpy.abs(max_accel)
+    max_jerk = numpy.abs(max_jerk)
+
+    # the triangle peak, on the far side of zero when ramping start_accel straight down
+    # to zero already covers more than dv
+    overshoot = dv < a0 * numpy.abs(a0) / (2 * max_jerk)
+    peak = numpy.where(
+        overshoot,
+        -numpy.sqrt(numpy.maximum(0.5 * a0**2 - dv * max_jerk, 0.0)),
+        numpy.sqrt(dv * max_jerk + 0.5 * a0**2),
+    )
+    peak = numpy.clip(peak, -max_accel, max_accel)
+
+    return phases_for_peak(dv, a0, peak, max_jerk, direction)
+
+
+def phases_for_peak(dv, a0, peak, jerk, direction):
+    """phase durations for a velocity change of dv reached with a given peak acceleration.
+    everything but direction is in the direction of travel, dv and jerk positive. the
+    first phase ramps a0 to the peak with whichever sign of jerk that takes, the last
+    one ramps the peak back to zero."""
+    t_acc = numpy.abs(peak - a0) / jerk
+    t_dec = numpy.abs(peak) / jerk
+    v_ramps = ((a0 + peak) * numpy.abs(peak - a0) + peak * numpy.abs(peak)) / (2 * jerk)
+    t_cruise = numpy.divide(dv - v_ramps, peak, out=numpy.zeros_like(v_ramps), where=peak != 0)
+    # a triangle lands on exactly zero cruise, rounding can leave a tiny negative
+    t_cruise = numpy.maximum(t_cruise, 0.0)
+    jerk_up = numpy.where(peak >= a0, jerk, -jerk)
+    return t_acc, t_cruise, t_dec, peak * direction, jerk_up * direction
+
+
+def evaluate_phases(t, start_vel, start_accel, target_vel, t1, t2, duration, v1, v2, peak_accel, jerk):
+    """(velocity, acceleration, jerk) of solved s-curve phases at times t. all arguments
+    broadcast against each other, so t can be sampled for many profiles at once. jerk is
+    the jerk of the first phase, the last phase ramps peak_accel back to zero."""
+    jerk_down = numpy.copysign(numpy.abs(jerk), peak_accel)
+    t1_ = numpy.clip(t, 0, t1)
+    t2_ = numpy.clip(t - t1, 0, t2 - t1)
+    t3_ = numpy.clip(t - t2, 0, duration - t2)
 
+    in_acc = (t > 0) & (t <= t1)
+    in_cruise = (t > t1) & (t <= t2)
+    in_dec = (t > t2) & (t <= duration)
+    conditions = [t <= 0, in_acc, in_cruise, in_dec]
+
+    vel = numpy.select(
+        conditions,
+        [
+            start_vel,
+            start_vel + start_accel * t1_ + 0.5 * jerk * t1_**2,
+            v1 + peak_accel * t2_,
+            v2 + peak_accel * t3_ - 0.5 * jerk_down * t3_**2,
+        ],
+        default=target_vel,
+    )
+    acc = numpy.select(
+        conditions,
+        [start_accel, start_accel + jerk * t1_, peak_accel, peak_accel - jerk_down * t3_],
+        default=0.0,
+    )
+    jrk = numpy.select([in_acc, in_dec], [jerk, -jerk_down], default=0.0)
+    return vel, acc, jrk
+
+
+Phase = namedtuple("Phase", ["name", "start", "end", "jerk", "accel", "vel"])
+
+
+class SCurveProfile:
+    """jerk limited velocity change, solved once so it can be sampled cheaply.
+
+    the three phases (jerk up, constant accel, jerk down) are found at construction,
+    covering the trapezoid and the triangle (no cruise) case as well as a start_accel
+    that has to be taken back first (see s_curve_phases). sample() is O(1) in
+    plain floats for control loops, evaluate() does whole arrays of times.
+    """
+
+    def __init__(self, start_vel, start_accel, target_vel, max_accel, max_jerk):
+        self.start_vel = start_vel
+        self.start_accel = start_accel
+        self.target_vel = target_vel
+
+        t_acc, t_cruise, t_dec, peak_accel, jerk = map(
+            float, s_curve_phases(start_vel, start_accel, target_vel, max_accel, max_jerk)
+        )
+        self.peak_accel = peak_accel
+        self.jerk = jerk
+        self.jerk_down = math.copysign(abs(jerk), peak_accel)
+
+        # phase boundaries and the velocity at each of them
+        self.t1 = t_acc
+        self.t2 = t_acc + t_cruise
+        self.duration = t_acc + t_cruise + t_dec
+        self.v1 = start_vel + (start_accel + peak_accel) / 2 * t_acc
+        self.v2 = self.v1 + peak_accel * t_cruise
+
+    @property
+    def phases(self):
+        return [
+            Phase("jerk_up", 0.0, self.t1, self.jerk, self.start_accel, self.start_vel),
+            Phase("cruise", self.t1, self.t2, 0.0, self.peak_accel, self.v1),
+            Phase("jerk_down", self.t2, self.duration, -self.jerk_down, self.peak_accel, self.v2),
+        ]
+
+    def sample(self, t):
+        """(velocity, acceleration, jerk) at a single time"""
         if t <= 0:
-            return start_vel
-        elif t <= t_acc:  # accelerating
-            j = max_jerk
-            a = start_accel + j * t
-            v = start_vel + start_accel * t + 0.5 * j * t**2
-        elif t <= t_acc + t_cruise:  # cruising
-            j = 0.0
-            a = peak_accel_val
-            v = start_vel + (start_accel + peak_accel_val) / 2 * t_acc + peak_accel_val * (t - t_acc)
-        elif t <= t_total:  # deceleratingp * (t - t
-            td = t - (t_acc + t_cruise)
-            j = max_jerk
-            a = peak_accel_val + j * td
-            v = v_acc + v_cruise + peak_accel_val * td - 0.5 * j * td**2
-        else:  # finished
-            return target_vel
-        return v
+            return self.start_vel, self.start_accel, 0.0
+        elif t <= self.t1:
+            return (
+                self.start_vel + self.start_accel * t + 0.5 * self.jerk * t**2,
+                self.start_accel + self.jerk * t,
+                self.jerk,
+            )
+        elif t <= self.t2:
+            return self.v1 + self.peak_accel * (t - self.t1), self.peak_accel, 0.0
+        elif t <= self.duration:
+            td = t - self.t2
+            return (
+                self.v2 + self.peak_accel * td - 0.5 * self.jerk_down * td**2,
+                self.peak_accel - self.jerk_down * td,
+                -self.jerk_down,
+            )
+        else:
+            return self.target_vel, 0.0, 0.0
+
+    def velocity(self, t):
+        return self.sample(t)[0]
+
+    def evaluate(self, t):
+        """(velocity, acceleration, jerk) arrays for an array of times"""
+        return evaluate_phases(
+            numpy.asarray(t, dtype=float),
+            self.start_vel,
+            self.start_accel,
+            self.target_vel,
+            self.t1,
+            self.t2,
+            self.duration,
+            self.v1,
+            self.v2,
+            self.peak_accel,
+            self.jerk,
+        )
+
+
+class SynchronizedProfile:
+    """jerk limited velocity changes on several axes that all finish at the same time.
+
+    every argument is a per axis array (or a scalar shared by all axes). each axis'
+    fastest profile is solved in one batched pass, then the faster axes are stretched to
+    the slowest one by lowering the magnitude of their peak acceleration, which has a
+    closed form. with everything in the direction of travel and c = dv - a0 |a0| / (2 J)
+    the velocity left over after ramping a0 straight to zero, the duration for peak A is
+        A >= a0:      T(A) = (A - a0) / J + (dv + a0**2 / (2 J)) / A
+        0 < A < a0:   T(A) = a0 / J + c / A
+        A < 0 (c < 0, the overshoot case): T(A) = (a0 - A) / J + c / A
+    and solving T(A) = T for the root nearest zero gives the gentlest profile that still
+    arrives on time. an axis whose start_accel alone takes it to the target by the time
+    the acceleration is back to zero (c == 0) can not be stretched and finishes early.
+    """
+
+    def __init__(self, start_vel, start_accel, target_vel, max_accel, max_jerk):
+        start_vel, start_accel, target_vel, max_accel, max_jerk = numpy.broadcast_arrays(
+            *(numpy.asarray(x, dtype=float) for x in (start_vel, start_accel, target_vel, max_accel, max_jerk))
+        )
+        self.start_vel = start_vel
+        self.start_accel = start_accel
+        self.target_vel = target_vel
+
+        t_acc, t_cruise, t_dec, _, _ = s_curve_phases(start_vel, start_accel, target_vel, max_accel, max_jerk)
+        self.duration = float(numpy.max(t_acc + t_cruise + t_dec, initial=0.0))
+
+        v_error = target_vel - start_vel
+        direction = numpy.where(v_error < 0, -1.0, 1.0)
+        dv = numpy.abs(v_error)
+        a0 = start_accel * direction
+        jerk = numpy.abs(max_jerk)
+
+        duration = self.duration
+        c = dv - a0 * numpy.abs(a0) / (2 * jerk)
+
+        # smaller roots of the two quadratics, A >= a0 and A < 0 (solved for -A)
+        b = duration * jerk + a0
+        k = dv * jerk + a0**2 / 2
+        above = (b - numpy.sqrt(numpy.maximum(b**2 - 4 * k, 0.0))) / 2
+        b = duration * jerk - a0
+        below = -(b - numpy.sqrt(numpy.maximum(b**2 + 4 * c * jerk, 0.0))) / 2
+        between = numpy.divide(c, duration - a0 / jerk, out=numpy.zeros_like(c), where=duration * jerk > a0)
+
+        peak = numpy.where(c < 0, below, numpy.where(above >= a0, above, between))
+        peak = numpy.clip(peak, -numpy.abs(max_accel), numpy.abs(max_accel))
+
+        t_acc, t_cruise, t_dec, self.peak_accel, self.jerk = phases_for_peak(dv, a0, peak, jerk, direction)
+        self.t1 = t_acc
+        self.t2 = t_acc + t_cruise
+        self.durations = t_acc + t_cruise + t_dec
+        self.v1 = start_vel + (start_accel + self.peak_accel) / 2 * t_acc
+        self.v2 = self.v1 + self.peak_accel * t_cruise
+
+    def sample(self, t):
+        """(velocity, acceleration, jerk) of every axis at a single time"""
+        return self.evaluate(t)
+
+    def evaluate(self, t):
+        """(velocity, acceleration, jerk) arrays shaped (axes,) + t.shape"""
+        t = numpy.asarray(t, dtype=float)
+        axis = (slice(None),) + (None,) * t.ndim
+        return evaluate_phases(
+            t,
+            self.start_vel[axis],
+            self.start_accel[axis],
+            self.target_vel[axis],
+            self.t1[axis],
+            self.t2[axis],
+            self.durations[axis],
+            self.v1[axis],
+            self.v2[axis],
+            self.peak_accel[axis],
+            self.jerk[axis],
+        )
+
+
+def s_curve_profile(t, start_vel, start_accel, target_vel, max_accel, max_jerk):
+    """s_curve_velocity for a whole array of times in one vectorized pass.
+    returns (velocity, acceleration, jerk) arrays shaped like t."""
+    return SCurveProfile(start_vel, start_accel, target_vel, max_accel, max_jerk).evaluate(t)
 
 
 if __name__ == "__main__":
-    positions = []
-    velocities = []
-    accelerations = []
+    import matplotlib.pyplot as plt
 
     sim_dt = 0.01
     sim_time = 10
@@ -92,18 +357,14 @@ if __name__ == "__main__":
     goal_vel = 30
     max_accel = 15
     max_jerk = 10
-    motor = Motor(start_pos=0, start_vel=start_vel)
 
-    for t in range(sim_iterations):
-        motor.update()
-        # motor.vel = ramp_velocity(t * sim_dt, start_vel, goal_vel, max_accel)
-        motor.vel = s_curve_velocity(t * sim_dt, start_vel, start_accel, goal_vel, max_accel, max_jerk)
-        positions.append(motor.pos)
-        velocities.append(motor.vel)
-        accelerations.append(motor.accel)
+    t = numpy.arange(sim_iterations) * sim_dt
+    # velocities, _, _ = ramp_profile(t, start_vel, goal_vel, max_accel)
+    velocities, _, _ = s_curve_profile(t, start_vel, start_accel, goal_vel, max_accel, max_jerk)
+    sim = simulate_motors(vel_commands=velocities, dt=sim_dt, start_vel=start_vel)
 
     plt.figure(figsize=(10, 6))
-    plt.plot(velocities, label="velocity")
+    plt.plot(sim.vel[0], label="velocity")
     plt.legend()
 
     plt.show()
@@ -0,0 +1,134 @@
+"""parameter sweeps for s-curve tuning.
+
+evaluates every combination of (start_vel, start_accel, target_vel, max_accel, max_jerk)
+over a process pool and writes one row of metrics per point, e.g.
+
+    python scurve_sweep.py --target-vel 500:6000:12 --max-accel 5000:50000:10 \
+        --max-jerk 1e4:1e6:10 --output sweep.npy
+"""
+
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from motion_planner import evaluate_phases, s_curve_phases
+
+
+PARAM_FIELDS = ("start_vel", "start_accel", "target_vel", "max_accel", "max_jerk")
+
+sweep_dtype = numpy.dtype(
+    [(name, numpy.float32) for name in PARAM_FIELDS]
+    + [
+        ("duration", numpy.float32),  # end of the planned profile
+        ("settle_time", numpy.float32),  # first time after which velocity stays within tolerance
+        ("peak_accel", numpy.float32),
+        ("peak_jerk", numpy.float32),
+        ("overshoot", numpy.float32),  # furthest the velocity goes past the target
+    ]
+)
+
+
+def make_grid(start_vel, start_accel, target_vel, max_accel, max_jerk):
+    """cartesian product of the parameter values as an (n, 5) array"""
+    values = (start_vel, start_accel, target_vel, max_accel, max_jerk)
+    axes = [numpy.atleast_1d(numpy.asarray(x, dtype=float)) for x in values]
+    mesh = numpy.meshgrid(*axes, indexing="ij")
+    return numpy.stack([m.ravel() for m in mesh], axis=1)
+
+
+def evaluate_chunk(params, dt, tol):
+    """metrics for a block of grid points, all points sampled together on one time grid"""
+    start_vel, start_accel, target_vel, max_accel, max_jerk = params.T
+    t_acc, t_cruise, t_dec, peak_accel, jerk = s_curve_phases(start_vel, start_accel, target_vel, max_accel, max_jerk)
+    duration = t_acc + t_cruise + t_dec
+    v1 = start_vel + (start_accel + peak_accel) / 2 * t_acc
+    v2 = v1 + peak_accel * t_cruise
+
+    t = numpy.arange(0, duration.max() + 2 * dt, dt)
+    col = numpy.s_[:, None]
+    vel, acc, jrk = evaluate_phases(
+        t,
+        start_vel[col],
+        start_accel[col],
+        target_vel[col],
+        t_acc[col],
+        (t_acc + t_cruise)[col],
+        duration[col],
+        v1[col],
+        v2[col],
+        peak_accel[col],
+        jerk[col],
+    )
+
+    error = vel - target_vel[col]
+    band = tol * numpy.maximum(numpy.abs(target_vel - start_vel), 1e-9)
+    outside = numpy.abs(error) > band[col]
+    # index of the last sample outside the band, settled from the one after it
+    last_outside = len(t) - 1 - numpy.argmax(outside[:, ::-1], axis=1)
+    settle_time = numpy.where(outside.any(axis=1), t[numpy.minimum(last_outside + 1, len(t) - 1)], 0.0)
+
+    direction = numpy.where(target_vel < start_vel, -1.0, 1.0)
+
+    out = numpy.empty(len(params), dtype=sweep_dtype)
+    for i, name in enumerate(PARAM_FIELDS):
+        out[name] = params[:, i]
+    out["duration"] = duration
+    out["settle_time"] = settle_time
+    out["peak_accel"] = numpy.abs(acc).max(axis=1)
+    out["peak_jerk"] = numpy.abs(jrk).max(axis=1)
+    out["overshoot"] = numpy.maximum((error * direction[col]).max(axis=1), 0.0)
+    return out
+
+
+def sweep(grid, dt=1e-3, tol=0.02, workers=None, chunk_size=256):
+    """evaluate every row of an (n, 5) grid across a process pool, rows come back in order.
+    workers=1 runs in this process."""
+    chunks = [grid[i : i + chunk_size] for i in range(0, len(grid), chunk_size)]
+    if workers == 1:
+        results = [evaluate_chunk(chunk, dt, tol) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(evaluate_chunk, chunks, itertools.repeat(dt), itertools.repeat(tol)))
+    return numpy.concatenate(results) if results else numpy.empty(0, dtype=sweep_dtype)
+
+
+def save(table, path):
+    """.npy keeps the structured array as is, anything else is written as csv"""
+    if os.path.splitext(path)[1] == ".npy":
+        numpy.save(path, table)
+    else:
+        numpy.savetxt(path, table, delimiter=",", header=",".join(table.dtype.names), comments="", fmt="%.6g")
+
+
+def parse_values(text):
+    """"a" for a single value, "a:b:n" for n values from a to b"""
+    parts = [float(p) for p in text.split(":")]
+    if len(parts) == 1:
+        return numpy.array(parts)
+    start, stop, num = parts
+    return numpy.linspace(start, stop, int(num))
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start-vel", type=parse_values, default=parse_values("0"))
+    parser.add_argument("--start-accel", type=parse_values, default=parse_values("0"))
+    parser.add_argument("--target-vel", type=parse_values, default=parse_values("500:6400:12"))
+    parser.add_argument("--max-accel", type=parse_values, default=parse_values("5000:50000:10"))
+    parser.add_argument("--max-jerk", type=parse_values, default=parse_values("10000:1000000:10"))
+    parser.add_argument("--dt", type=float, default=1e-3)
+    parser.add_argument("--tol", type=float, default=0.02, help="settle band as a fraction of the velocity change")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="sweep.npy")
+    args = parser.parse_args()
+
+    grid = make_grid(args.start_vel, args.start_accel, args.target_vel, args.max_accel, args.max_jerk)
+    start = time.perf_counter()
+    table = sweep(grid, dt=args.dt, tol=args.tol, workers=args.workers)
+    print(f"{len(table)} points in {time.perf_counter() - start:.2f} s")
+    save(table, args.output)
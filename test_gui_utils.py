@@ -0,0 +1,443 @@
+import numpy as np
+import pytest
+from cobs import cobs
+import multiprocessing
+import time
+
+from gui_utils import (
+    RxPacket,
+    SerialIOHandler,
+    SerialProcessHandler,
+    SetpointStreamer,
+    SPSCRing,
+    StepperPlant,
+    TxEncoder,
+    TxPacket,
+    TxSegment,
+    cobs_decode_frames,
+    decode_frames,
+    encode_batch_frames,
+    encode_frames,
+    parse_tx,
+)
+
+
+def make_frame(**fields):
+    values = dict(
+        timestamp=0,
+        echo_stepper0=0,
+        echo_stepper1=0,
+        echo_stepper2=0,
+        echo_stepper3=0,
+        encoder_angle=0,
+        open_loop_angle=0,
+        state=0,
+    )
+    values.update(fields)
+    return cobs.encode(RxPacket._struct.build(values)) + b"\x00"
+
+
+class FakeSerial:
+    """Hands out a byte string in fixed size reads like a busy port would."""
+
+    is_open = True
+
+    def __init__(self, data=b"", chunk=50):
+        self.data = data
+        self.chunk = chunk
+        self.written = []
+
+    @property
+    def in_waiting(self):
+        return min(self.chunk, len(self.data))
+
+    def read(self, n):
+        out, self.data = self.data[:n], self.data[n:]
+        return out
+
+    def write(self, data):
+        self.written.append(bytes(data))
+
+    def close(self):
+        self.is_open = False
+
+
+def test_decode_frames_matches_construct():
+    """Batch decoding should agree field for field with the construct parser."""
+    frames = [
+        make_frame(timestamp=1000 + i, echo_stepper1=-i * 300, encoder_angle=i, state=i % 2) for i in range(50)
+    ]
+    out = np.zeros(64, dtype=RxPacket.serial_rx_dtype)
+
+    result = decode_frames(b"".join(frames), out)
+
+    assert result.count == 50
+    assert result.size_errors == 0 and result.decode_errors == 0
+    for i, frame in enumerate(frames):
+        assert out[i] == RxPacket.from_bytes(cobs.decode(frame[:-1])).as_array()
+
+
+def test_cobs_decode_frames_matches_cobs():
+    """Random zero heavy payloads of every length decode like the reference library,
+    corrupted frames are flagged wherever the reference one refuses them."""
+    rng = np.random.default_rng(0)
+    for length in (1, 2, 7, 32, 100, 233, 253):
+        payloads = rng.integers(0, 4, size=(50, length), dtype=np.uint8) * rng.integers(0, 256, size=(50, length))
+        payloads = payloads.astype(np.uint8)
+        frames = np.array([list(cobs.encode(p.tobytes())) for p in payloads], dtype=np.uint8)
+        # never a zero, inside a stream that would just be a delimiter
+        frames[::5, rng.integers(0, length + 1)] = rng.integers(1, 256)
+
+        decoded, ok = cobs_decode_frames(frames)
+
+        for frame, payload, good in zip(frames, decoded, ok):
+            try:
+                expected = cobs.decode(frame.tobytes())
+            except cobs.DecodeError:
+                expected = None
+            if good:
+                assert payload.tobytes() == expected
+            else:
+                assert expected is None or len(expected) != length
+
+
+def test_decode_frames_zero_payload():
+    """An all zero payload is the worst case for the cobs code chain."""
+    out = np.ones(1, dtype=RxPacket.serial_rx_dtype)
+    assert decode_frames(make_frame(), out).count == 1
+    assert out[0] == np.zeros(1, dtype=RxPacket.serial_rx_dtype)[0]
+
+
+def test_decode_frames_skips_bad_frames():
+    """Wrong sized and corrupt frames are counted and skipped, the rest still decode."""
+    corrupt = bytearray(make_frame(timestamp=7))
+    corrupt[0] = 40  # code byte pointing past the end of the frame
+    block = make_frame(timestamp=1) + b"\x01\x02\x00" + bytes(corrupt) + b"\x00" + make_frame(timestamp=2)
+    out = np.zeros(8, dtype=RxPacket.serial_rx_dtype)
+
+    result = decode_frames(block, out)
+
+    assert result == (2, 1, 1)
+    assert list(out["timestamp"][:2]) == [1, 2]
+
+
+def test_decode_frames_respects_output_size():
+    block = b"".join(make_frame(timestamp=i) for i in range(10))
+    out = np.zeros(4, dtype=RxPacket.serial_rx_dtype)
+    assert decode_frames(block, out).count == 4
+    assert list(out["timestamp"]) == [0, 1, 2, 3]
+
+
+def test_encode_frames_round_trip():
+    """Bulk encoding should produce the same bytes as cobs frame by frame and decode back."""
+    samples = np.zeros(40, dtype=RxPacket.serial_rx_dtype)
+    samples["timestamp"] = np.arange(40) * 256  # zero low bytes
+    samples["echo_stepper1"] = np.arange(40) * -300
+    samples["encoder_angle"] = np.arange(40) % 3
+    out = np.zeros(40, dtype=RxPacket.serial_rx_dtype)
+
+    stream = encode_frames(samples)
+
+    assert stream == b"".join(
+        make_frame(**{name: int(row[name]) for name in samples.dtype.names}) for row in samples
+    )
+    assert decode_frames(stream, out).count == 40
+    assert np.array_equal(out, samples)
+
+
+def batch_samples(n, first=1000, period_us=500):
+    samples = np.zeros(n, dtype=RxPacket.serial_rx_dtype)
+    samples["timestamp"] = first + np.arange(n) * period_us // 1000
+    samples["echo_stepper2"] = np.arange(n) * -7
+    samples["encoder_angle"] = np.arange(n) * 256
+    samples["state"] = np.arange(n) % 2
+    return samples
+
+
+def test_batch_frames_round_trip():
+    """Batched frames decode back to the same rows, timestamps rebuilt from the period."""
+    samples = batch_samples(21)
+    stream = encode_batch_frames(samples, period_us=500, per_frame=4)
+    out = np.zeros(32, dtype=RxPacket.serial_rx_dtype)
+
+    assert stream.count(b"\x00") == 6  # five full frames and one with a single sample
+    assert decode_frames(stream, out) == (21, 0, 0)
+    assert np.array_equal(out[:21], samples)
+
+
+def test_decode_mixed_single_and_batch_frames_in_order():
+    batch = batch_samples(9, first=10)
+    corrupt = bytearray(encode_batch_frames(batch[:3], period_us=1000))
+    corrupt[0] = 0xFE
+    stream = make_frame(timestamp=1) + encode_batch_frames(batch, period_us=500) + bytes(corrupt) + make_frame(timestamp=99)
+    out = np.zeros(16, dtype=RxPacket.serial_rx_dtype)
+
+    result = decode_frames(stream, out)
+
+    assert result == (11, 0, 1)
+    assert list(out["timestamp"][:11]) == [1] + list(batch["timestamp"]) + [99]
+
+
+def test_decode_batch_stops_at_output_size():
+    """A batch that no longer fits is left out whole, nothing after it is decoded."""
+    stream = encode_batch_frames(batch_samples(8), period_us=500, per_frame=4) + make_frame(timestamp=5)
+    out = np.zeros(6, dtype=RxPacket.serial_rx_dtype)
+    assert decode_frames(stream, out).count == 4
+
+
+def test_synthetic_source_feeds_rx_path():
+    handler = SerialIOHandler()
+    handler.start_synthetic(rate_hz=10000, burst=100)
+    time.sleep(0.1)
+    handler.stop()
+
+    assert handler.generated >= 100
+    assert handler.stats.frames_received == handler.generated
+    assert handler.stats.decode_errors == 0
+    timestamps = handler.rx_ring.peek()["timestamp"]
+    assert list(timestamps[:3]) == [0, 0, 0] and timestamps[10] == 1
+
+
+def test_read_samples_across_reads():
+    """Frames split across reads are stitched back together, leading garbage is dropped."""
+    ser = FakeSerial(b"\x05\x06" + b"".join(make_frame(timestamp=i) for i in range(100)), chunk=50)
+    handler = SerialIOHandler()
+
+    timestamps = []
+    while ser.data:
+        timestamps.extend(handler.read_samples(ser)["timestamp"])
+
+    # the first frame is glued to the garbage and cannot be recovered
+    assert timestamps == list(range(1, 100))
+    assert len(handler.buf) == 0
+
+
+def test_read_samples_resyncs_after_corrupt_frame():
+    corrupt = bytearray(make_frame(timestamp=5))
+    corrupt[3] = 0x7F  # breaks the code chain
+    ser = FakeSerial(make_frame(timestamp=4) + bytes(corrupt) + make_frame(timestamp=6), chunk=4096)
+
+    handler = SerialIOHandler()
+    samples = handler.read_samples(ser)
+
+    assert list(samples["timestamp"]) == [4, 6]
+    assert handler.stats.decode_errors == 1
+    assert handler.stats.bytes_received == 3 * 34
+
+
+def test_tx_packet_layout_matches_construct():
+    packet = TxPacket(-1, 2**31 - 1, 0, 42.9, commanded_max_acceleration=np.int64(5000))
+    raw = packet.to_bytes()
+
+    assert raw == TxPacket._struct.build(
+        dict(
+            commanded_speed_stepper0=-1,
+            commanded_speed_stepper1=2**31 - 1,
+            commanded_speed_stepper2=0,
+            commanded_speed_stepper3=42,
+            commanded_max_acceleration=5000,
+        )
+    )
+    assert TxPacket.from_bytes(raw) == TxPacket(-1, 2**31 - 1, 0, 42, 5000)
+
+
+def test_tx_encoder_suppresses_repeats_until_keepalive():
+    encoder = TxEncoder(keepalive=0.5)
+
+    first = encoder.encode(TxPacket(100), now=0.0)
+    assert first == cobs.encode(TxPacket(100).to_bytes()) + b"\x00"
+    assert encoder.encode(TxPacket(100), now=0.1) is None
+    assert encoder.encode(TxPacket(100), now=0.49) is None
+    # a change goes out straight away, an unchanged command again once keepalive passed
+    assert encoder.encode(TxPacket(101), now=0.5) is not None
+    assert encoder.encode(TxPacket(101), now=0.6) is None
+    assert encoder.encode(TxPacket(101), now=1.0) is not None
+
+
+def test_tx_segment_round_trip():
+    segment = TxSegment(100, -200, 0, 3000, 1, 2, 3, 4, jerk=10**6)
+    raw = segment.to_bytes()
+
+    assert raw[0] == TxSegment.SEGMENT_TAG
+    assert parse_tx(raw) == segment
+    assert parse_tx(TxPacket(9).to_bytes()) == TxPacket(9)
+    with pytest.raises(ValueError):
+        TxSegment.from_bytes(b"\x00" + raw[1:])
+
+
+def test_setpoint_streamer_only_replans_on_change():
+    streamer = SetpointStreamer(max_jerk=10**6, deadband=50)
+
+    first = streamer.plan([0, 3000, 0, 0], max_accel=20000, now=0.0)
+    assert first.target_speeds.tolist() == [0, 3000, 0, 0]
+    assert streamer.plan([0, 3040, 0, 0], max_accel=20000, now=0.01) is None
+
+    # the next plan starts where the current one is, not from rest
+    vel, acc = streamer.sample(now=0.1)
+    assert 0 < vel[1] < 3000 and acc[1] > 0
+    streamer.plan([0, -3000, 0, 0], max_accel=20000, now=0.1)
+    assert streamer.profile.start_vel[1] == pytest.approx(vel[1])
+    assert streamer.profile.start_accel[1] == pytest.approx(acc[1])
+
+
+def test_stepper_plant_follows_segment_in_sync():
+    """All steppers arrive together on the host's plan, jerk and acceleration limited."""
+    streamer = SetpointStreamer(max_jerk=10**6)
+    segment = streamer.plan([500, 4000, -1000, 0], max_accel=20000, now=0.0)
+    plant = StepperPlant(seed=0)
+    plant.command(segment)
+
+    t = np.arange(1, 601) * 0.001
+    vel, pos = plant.advance(t)
+
+    # the MCU replans from integer limits, within a step per second of the host's plan
+    assert np.allclose(vel, streamer.profile.evaluate(t)[0], atol=1)
+    assert np.allclose(vel[:, -1], [500, 4000, -1000, 0])
+    arrival = [np.argmax(np.isclose(v, v[-1])) for v in vel[:3]]
+    assert max(arrival) - min(arrival) <= 1
+    acc = np.diff(vel, axis=1) / 0.001
+    assert np.abs(acc).max() <= 20000 + 1
+    assert np.allclose(np.diff(pos, axis=1), (vel[:, 1:] + vel[:, :-1]) / 2 * 0.001)
+
+    # joystick pushed further for 30 ms and released again, replanned mid acceleration
+    streamer = SetpointStreamer(max_jerk=500000)
+    plant = StepperPlant(seed=0)
+    t = np.arange(1, 31) * 0.001
+    plant.command(streamer.plan([0, 1500, 0, 0], max_accel=50000, now=0.0))
+    ramp = [plant.advance(t)[0]]
+    plant.command(streamer.plan([0, 3000, 0, 0], max_accel=50000, now=0.03))
+    ramp.append(plant.advance(t)[0])
+    # as far as taking the acceleration back at the jerk limit has to go, no further
+    furthest = plant.vel[1] + plant.acc[1] ** 2 / (2 * 500000)
+    assert furthest > 1500
+    plant.command(streamer.plan([0, 1500, 0, 0], max_accel=50000, now=0.06))
+    ramp.append(plant.advance(np.arange(1, 501) * 0.001)[0])
+
+    vel = np.concatenate(ramp, axis=1)
+    assert np.abs(np.diff(vel, axis=1)).max() <= 50000 * 0.001 + 1
+    assert vel[1].max() <= furthest + 1
+    assert vel[1, -1] == pytest.approx(1500)
+
+
+def test_send_counts_suppressed_commands():
+    handler = SerialIOHandler()
+    handler.ser = FakeSerial()
+
+    for speed in (0, 0, 0, 5, 5):
+        handler.send(TxPacket(speed))
+
+    assert len(handler.ser.written) == 2
+    assert handler.stats.tx_sends == 2
+    assert handler.stats.tx_suppressed == 3
+
+
+def test_loop_polls_ports_without_fileno():
+    """Ports that cannot be selected on are polled, rx and tx both still flow."""
+    handler = SerialIOHandler()
+    handler.ser = FakeSerial(b"".join(make_frame(timestamp=i) for i in range(20)), chunk=100)
+    handler.start()
+    handler.queue_latest_tx(TxPacket(7))
+    time.sleep(0.05)
+    handler.stop()
+
+    assert list(handler.rx_ring.peek()["timestamp"]) == list(range(20))
+    assert handler.ser.written == [cobs.encode(TxPacket(7).to_bytes()) + b"\x00"]
+
+
+def test_tx_wakeup_sockets_are_closed_on_stop():
+    """The wakeup pair lives from start() to stop(), the ingest process handler wakes on its pipe."""
+    handler = SerialIOHandler()
+    handler.ser = FakeSerial(b"")
+    handler.start()
+    sockets = (handler.tx_wake_r, handler.tx_wake_w)
+    handler.stop()
+
+    assert [sock.fileno() for sock in sockets] == [-1, -1]
+    handler.queue_latest_tx(TxPacket(7))  # still fine without a loop to wake up
+
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    child = SerialProcessHandler(115200, SPSCRing(capacity=16, dtype=RxPacket.serial_rx_dtype), receiver)
+    assert child.tx_wake_r is None and child.tx_wakeup() is receiver
+    receiver.close()
+    sender.close()
+
+
+def test_spsc_ring_wraps_into_one_slice():
+    """Unread records come back as a single contiguous slice even across the wrap point."""
+    ring = SPSCRing(capacity=8, dtype=np.int64)
+    ring.write(np.arange(6))
+    ring.consume(len(ring.peek()))
+
+    assert ring.write(np.arange(6, 13)) == 7
+    assert list(ring.peek()) == list(range(6, 13))
+    ring.consume(7)
+    assert len(ring) == 0 and len(ring.peek()) == 0
+
+
+def test_spsc_ring_drops_newest_on_overrun():
+    ring = SPSCRing(capacity=4, dtype=np.int64)
+    assert ring.write(np.arange(3)) == 3
+    assert ring.write(np.arange(3, 6)) == 1
+    assert ring.overruns == 2
+    assert list(ring.peek()) == [0, 1, 2, 3]
+
+
+def test_shared_spsc_ring_attaches_by_name():
+    """A second handle on the same shared memory sees what the first one wrote."""
+    owner = SPSCRing.shared(capacity=16, dtype=RxPacket.serial_rx_dtype)
+    producer = SPSCRing.shared(capacity=16, dtype=RxPacket.serial_rx_dtype, name=owner.shm.name)
+    try:
+        records = np.zeros(5, dtype=RxPacket.serial_rx_dtype)
+        records["timestamp"] = np.arange(5)
+        producer.write(records)
+
+        assert list(owner.peek()["timestamp"]) == [0, 1, 2, 3, 4]
+    finally:
+        producer.close()
+        owner.close()
+
+
+def test_stepper_plant_respects_max_acceleration():
+    """Each stepper slews to its command at commanded_max_acceleration, never faster."""
+    plant = StepperPlant(seed=0)
+    plant.command(TxPacket(1000, -3000, 0, 500, commanded_max_acceleration=10000))
+
+    t = np.arange(1, 501) * 0.001
+    vel, pos = plant.advance(t)
+
+    assert np.allclose(vel[:, -1], [1000, -3000, 0, 500])
+    assert np.abs(np.diff(vel, axis=1)).max() <= 10000 * 0.001 + 1e-9
+    assert vel[1, 99] == pytest.approx(-1000)  # still ramping after 0.1 s
+    # position is the integral of velocity
+    assert np.allclose(np.diff(pos, axis=1), (vel[:, 1:] + vel[:, :-1]) / 2 * 0.001, atol=1e-6)
+
+
+def test_stepper_plant_chunked_matches_single_call():
+    whole = StepperPlant(seed=0)
+    chunked = StepperPlant(seed=0)
+    for plant in (whole, chunked):
+        plant.command(TxPacket(0, 2000, 0, 0, commanded_max_acceleration=5000))
+
+    whole.advance(np.linspace(0.01, 1.0, 100))
+    for _ in range(10):
+        chunked.advance(np.linspace(0.01, 0.1, 10))
+
+    assert np.allclose(whole.vel, chunked.vel)
+    assert np.allclose(whole.pos, chunked.pos)
+
+
+def test_stepper_plant_samples():
+    plant = StepperPlant(seed=0)
+    plant.command(TxPacket(0, 6400, 0, 0, commanded_max_acceleration=10**9))
+
+    rows = plant.samples([10, 20], [0.25, 0.5])
+
+    assert list(rows["timestamp"]) == [10, 20]
+    assert list(rows["echo_stepper1"]) == [6400, 6400]
+    # a quarter and a half turn of the 4096 count encoder
+    assert list(rows["open_loop_angle"]) == [1024, 2048]
+    assert np.all(np.abs(rows["encoder_angle"].astype(int) - rows["open_loop_angle"]) < 120)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
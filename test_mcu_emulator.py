@@ -0,0 +1,244 @@
+import os
+import time
+
+import numpy as np
+import pytest
+import serial
+from cobs import cobs
+
+if not hasattr(os, "openpty"):
+    pytest.skip("needs a pseudo terminal", allow_module_level=True)
+
+import capture
+from gui_utils import SerialIOHandler, SetpointStreamer, TxPacket, TxSegment
+from mcu_emulator import McuEmulator
+
+
+def wait_until(condition, timeout=10.0):
+    """poll until condition() holds, a busy machine slows the emulator down but never fails a test"""
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_handler_finds_and_reads_emulator():
+    """The real port path (try_ports + read_and_send_loop) works against the pty."""
+    with McuEmulator(rate_hz=1000, seed=0) as emulator:
+        handler = SerialIOHandler()
+        handler.find_ports(extra_ports=[emulator.port])
+        assert handler.usb_ports[0] == emulator.port
+
+        assert handler.try_ports() is True
+        assert handler.port == emulator.port
+        handler.start()
+        handler.queue_latest_tx(TxPacket(0, 3000, 0, 0, commanded_max_acceleration=10**6))
+
+        def arrived():
+            samples = handler.rx_ring.peek()
+            return len(samples) > 100 and samples["echo_stepper1"][-1] == 3000
+
+        assert wait_until(arrived)
+        handler.stop()
+
+        samples = handler.rx_ring.peek()
+        steps = np.diff(samples["timestamp"].astype(int))
+        # the emulator drops frames when it falls behind, the rest arrive in order
+        assert np.all(steps >= 1)
+        assert np.all(steps == 1) or emulator.frames_dropped > 0
+        assert emulator.commands_received == 1
+        assert handler.stats.decode_errors == 0
+
+
+@pytest.mark.parametrize("batch", [None, 9])
+def test_emulator_stream_follows_plant_time(batch):
+    """Every ms is stamped once and the plant moves on by the time between samples,
+    also when several frames go out in one pass of the emulator loop."""
+    with McuEmulator(rate_hz=1000, batch=batch, seed=0) as emulator:
+        handler = SerialIOHandler()
+        handler.usb_ports = [emulator.port]
+        assert handler.try_ports()
+        handler.start()
+        handler.queue_latest_tx(TxPacket(0, 3000, 0, 0, commanded_max_acceleration=10000))
+
+        def arrived():
+            samples = handler.rx_ring.peek()
+            return len(samples) and samples["echo_stepper1"][-1] == 3000
+
+        assert wait_until(arrived)
+        handler.stop()
+
+    samples = handler.rx_ring.peek()
+    ms = np.diff(samples["timestamp"].astype(int))
+    assert np.all(ms >= 1)
+    # 10 steps/s more every ms while ramping, within rounding
+    echo = samples["echo_stepper1"].astype(int)
+    ramping = (echo[:-1] > 0) & (echo[1:] < 3000)
+    assert ramping.sum() > 100
+    assert np.all(np.abs(np.diff(echo)[ramping] - 10 * ms[ramping]) <= 1)
+
+
+def test_ingest_process_against_emulator(tmp_path):
+    """start_process: frames come back through the shared ring, commands and the capture
+    are handled in the ingest process, joystick records are forwarded to it."""
+    path = tmp_path / "session.cap"
+    with McuEmulator(rate_hz=1000, seed=0) as emulator:
+        handler = SerialIOHandler()
+        handler.usb_ports = [emulator.port]
+        assert handler.try_ports()
+        handler.start_process()
+        recorder = handler.start_recording(path)
+        recorder.record(capture.BLUETOOTH, b"\x01" * 20)
+        handler.queue_latest_tx(TxPacket(0, 3000, 0, 0, commanded_max_acceleration=10**6))
+
+        def arrived():
+            samples = handler.rx_ring.peek()
+            return len(samples) > 100 and samples["echo_stepper1"][-1] == 3000
+
+        # the spawned process has to import everything first
+        assert wait_until(arrived, timeout=30)
+        handler.poll_shared_ring()
+        assert handler.stats.frames_received > 100
+        assert handler.stats.tx_sends == 1
+        handler.stop()
+
+    assert emulator.commands_received == 1
+    reader = capture.CaptureReader(path)
+    kinds = [kind for kind, _, _ in reader.records()]
+    reader.close()
+    assert kinds.count(capture.RAW_RX) > 0
+    assert kinds.count(capture.TX) == 1
+    assert kinds.count(capture.BLUETOOTH) == 1
+
+
+def test_ingest_process_reports_lost_port(tmp_path, capsys):
+    """When the port goes away the ingest process exits, the GUI side notices and drops
+    whatever it would have forwarded instead of raising."""
+    emulator = McuEmulator(rate_hz=1000, seed=0).start()
+    handler = SerialIOHandler()
+    handler.usb_ports = [emulator.port]
+    assert handler.try_ports()
+    handler.start_process()
+    recorder = handler.start_recording(tmp_path / "session.cap")
+    assert wait_until(lambda: len(handler.rx_ring) > 0, timeout=30)
+
+    emulator.stop()  # like unplugging the usb port
+
+    def noticed():
+        handler.poll_shared_ring()
+        return not handler.running
+
+    assert wait_until(noticed)
+    handler.queue_latest_tx(TxPacket(5))
+    recorder.record(capture.BLUETOOTH, b"\x01" * 20)
+    handler.stop()
+    assert "serial port lost" in capsys.readouterr().out
+
+
+def test_commands_go_out_while_mcu_is_silent():
+    """TX is not gated on RX, a quiet MCU does not hold commands back."""
+    with McuEmulator(rate_hz=1000, boot_delay=60) as emulator:
+        handler = SerialIOHandler()
+        handler.ser = serial.Serial(emulator.port, timeout=0.1)
+        handler.start()
+        for speed in range(1, 6):
+            handler.queue_latest_tx(TxPacket(speed))
+            time.sleep(0.02)
+        handler.stop()
+
+    assert emulator.frames_sent == 0
+    assert emulator.commands_received == 5
+    assert emulator.last_command == TxPacket(5)
+    assert handler.stats.tx_latency_ns / handler.stats.tx_sends < 5e6
+
+
+def test_setpoint_streaming_against_emulator():
+    """One segment frame drives the emulated MCU along the host's plan."""
+    with McuEmulator(rate_hz=1000, seed=0) as emulator:
+        handler = SerialIOHandler()
+        handler.usb_ports = [emulator.port]
+        assert handler.try_ports()
+        handler.start()
+
+        streamer = SetpointStreamer(max_jerk=10**6)
+        targets = [0, 4000, -2000, 1000]
+        handler.queue_latest_tx(streamer.plan(targets, max_accel=40000))
+        assert streamer.plan([0, 4010, -2000, 1000], max_accel=40000) is None
+
+        def arrived():
+            samples = handler.rx_ring.peek()
+            return len(samples) and [samples[f"echo_stepper{i}"][-1] for i in range(4)] == targets
+
+        assert wait_until(arrived)
+        handler.stop()
+
+        samples = handler.rx_ring.peek()
+        echo = np.stack([samples[f"echo_stepper{i}"] for i in range(4)])
+
+    assert isinstance(emulator.last_command, TxSegment)
+    assert emulator.commands_received == 1
+    assert handler.stats.bytes_received > 0
+    # no stepper speeds up by more than the limit per 1 ms, also across dropped frames.
+    # every frame has its own ms, a repeated stamp would be a jump in no time
+    ms = np.diff(samples["timestamp"].astype(float))
+    assert np.all(ms >= 1)
+    assert np.all(np.abs(np.diff(echo.astype(float), axis=1)) <= 40 * ms + 1)
+
+
+def test_batched_frames_against_emulator():
+    """Batched frames carry more samples through the same 115200 baud link."""
+    bytes_per_sample = {}
+    for batch in (None, 9):
+        # 1000 samples/s saturate the link either way, a small buffer keeps the head start short
+        with McuEmulator(rate_hz=1000, baudrate=115200, tx_buffer=512, batch=batch, seed=0) as emulator:
+            handler = SerialIOHandler()
+            handler.usb_ports = [emulator.port]
+            assert handler.try_ports()
+            # opening the port flushes its input, try_ports may have started mid frame
+            before = handler.stats.snapshot()
+            handler.start()
+            assert wait_until(lambda: len(handler.rx_ring) >= 300)
+            handler.stop()
+
+        samples = handler.rx_ring.peek()
+        assert handler.stats.decode_errors == before.decode_errors
+        assert handler.stats.size_errors == before.size_errors
+        assert emulator.frames_dropped > 0
+        assert np.all(np.diff(samples["timestamp"].astype(int)) > 0)
+        bytes_per_sample[batch] = (handler.stats.bytes_received - before.bytes_received) / (
+            handler.stats.frames_received - before.frames_received
+        )
+
+    # 235 bytes a frame of 9 instead of 34 a sample, whatever the link timing
+    assert bytes_per_sample[None] == pytest.approx(34, rel=0.05)
+    assert bytes_per_sample[9] == pytest.approx(235 / 9, rel=0.1)
+
+
+def test_emulator_counts_bad_commands():
+    with McuEmulator(rate_hz=100) as emulator:
+        ser = serial.Serial(emulator.port, timeout=0.1)
+        ser.write(cobs.encode(b"\x01\x02") + b"\x00" + cobs.encode(TxPacket(5).to_bytes()) + b"\x00")
+        time.sleep(0.1)
+        ser.close()
+
+    assert emulator.command_errors == 1
+    assert emulator.commands_received == 1
+    assert emulator.last_command == TxPacket(5)
+
+
+def test_emulator_drops_frames_the_link_cannot_carry():
+    """2000 frames/s of 34 bytes do not fit through 115200 baud, the surplus is dropped."""
+    with McuEmulator(rate_hz=2000, baudrate=115200, tx_buffer=1024) as emulator:
+        ser = serial.Serial(emulator.port, timeout=0.1)
+        received = 0
+        end = time.monotonic() + 0.5
+        while time.monotonic() < end:
+            received += len(ser.read(4096))
+        ser.close()
+
+    assert emulator.frames_dropped > 0
+    # 11520 bytes/s for half a second plus the buffer that was filled up front
+    assert received <= 11520 * 0.6 + 1024
+    assert received >= 11520 * 0.3
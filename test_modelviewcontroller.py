@@ -0,0 +1,256 @@
+import os
+import time
+from unittest import mock
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtWidgets import QApplication
+
+from gui_utils import PipelineStats
+from modelviewcontroller import CircularBuffer, Controller, HistoryStore, PlotView, minmax_decimate
+
+
+def test_push_many_matches_push():
+    """Bulk writes should leave the buffer exactly as one push per sample would."""
+    bulk = CircularBuffer(size=16, dtype=np.int64)
+    single = CircularBuffer(size=16, dtype=np.int64)
+    values = np.arange(45)
+
+    for chunk in np.array_split(values, [3, 10, 11, 30]):
+        bulk.push_many(chunk)
+    for v in values:
+        single.push(v)
+
+    assert bulk.index == single.index
+    assert np.array_equal(bulk.get_all(), single.get_all())
+    assert bulk.count == single.count == 45
+
+
+def test_push_many_wraps():
+    buf = CircularBuffer(size=8, dtype=np.int64)
+    buf.push_many(np.arange(6))
+    buf.push_many(np.arange(6, 11))
+    assert list(buf.get_all()) == list(range(3, 11))
+    assert buf.get_latest() == 10
+
+
+def test_push_many_larger_than_buffer():
+    """Only the newest samples are kept but every sample is counted."""
+    buf = CircularBuffer(size=8, dtype=np.int64)
+    buf.push(-1)
+    assert buf.push_many(np.arange(20)) == 20
+    assert list(buf.get_all()) == list(range(12, 20))
+    assert buf.count == 21
+
+
+def test_get_last_is_read_only_view():
+    """Snapshots share memory with the ring and come out in chronological order."""
+    buf = CircularBuffer(size=8, dtype=np.int64)
+    buf.push_many(np.arange(13))
+
+    last = buf.get_last(5)
+
+    assert list(last) == [8, 9, 10, 11, 12]
+    assert np.shares_memory(last, buf.buffer)
+    assert not last.flags.writeable
+    assert list(buf.get_last(100)) == list(range(5, 13))
+
+
+def test_minmax_decimate_keeps_envelope():
+    """Every bin's extremes survive, so spikes are still drawn."""
+    rng = np.random.default_rng(0)
+    x = np.arange(10007)
+    y = rng.normal(size=len(x))
+    y[[5, 5000, 10006]] = [50, -50, 40]
+
+    xd, yd = minmax_decimate(x, y, bins=100)
+
+    assert len(xd) <= 2 * 100 + 2
+    assert np.all(np.diff(xd) > 0)
+    assert set(yd) >= {50, -50, 40}
+    assert np.array_equal(yd, y[xd])
+
+
+def test_minmax_decimate_leaves_short_curves():
+    x, y = np.arange(50), np.arange(50.0)
+    assert minmax_decimate(x, y, bins=100) == (x, y)
+
+
+def test_plot_view_draws_only_what_is_visible():
+    QApplication.instance() or QApplication([])
+    view = PlotView()
+    view_box = view.linear_plot_widget.getViewBox()
+    view_box.setXRange(1000, 2000, padding=0)
+    x = np.arange(100000)
+
+    view.set_linear_curve(view.plot_echo, x, np.sin(x / 50.0))
+
+    xs, ys = view.plot_echo.getData()
+    assert xs.min() >= 999 and xs.max() <= 2001
+    assert len(xs) <= 2 * view_box.width() + 2
+    view.close()
+
+
+def test_plot_view_curves_do_not_follow_the_buffer():
+    """Curves get a copy of the buffer view, later pushes do not change what is drawn."""
+    QApplication.instance() or QApplication([])
+    view = PlotView()
+    buffer = CircularBuffer(size=8, dtype=np.dtype([("timestamp", np.int32), ("value", np.int32)]))
+    buffer.push_many(np.array([(i, i) for i in range(8)], dtype=buffer.buffer.dtype))
+
+    data = buffer.get_all()
+    view.set_linear_curve(view.plot_echo, data["timestamp"], data["value"])
+    buffer.push_many(np.array([(i, -i) for i in range(8, 16)], dtype=buffer.buffer.dtype))
+
+    xs, ys = view.plot_echo.getData()
+    assert xs.tolist() == list(range(8)) and ys.tolist() == list(range(8))
+    view.close()
+
+
+history_test_dtype = np.dtype([("timestamp", np.uint32), ("value", np.int32)])
+
+
+def fill_history(n, chunk, factor=4, levels=3, level_size=64):
+    raw = CircularBuffer(size=32, dtype=history_test_dtype)
+    history = HistoryStore(raw, fields=("value",), factor=factor, levels=levels, level_size=level_size)
+    samples = np.zeros(n, dtype=history_test_dtype)
+    samples["timestamp"] = np.arange(n)
+    samples["value"] = np.random.default_rng(0).integers(-1000, 1000, n)
+    for i in range(0, n, chunk):
+        raw.push_many(samples[i : i + chunk])
+        history.append(samples[i : i + chunk])
+    return history, samples
+
+
+def test_history_levels_match_direct_reduction():
+    """Incremental appends in odd sized chunks give the same levels as reducing everything at once."""
+    history, samples = fill_history(1000, chunk=7, level_size=256)
+
+    for level, factor in enumerate((4, 16, 64)):
+        buckets = samples[: len(samples) // factor * factor].reshape(-1, factor)
+        records = history.levels[level].get_last(len(buckets))
+        assert np.array_equal(records["timestamp"], buckets["timestamp"][:, 0])
+        assert np.array_equal(records["value_min"], buckets["value"].min(axis=1))
+        assert np.array_equal(records["value_max"], buckets["value"].max(axis=1))
+        assert np.allclose(records["value_mean"], buckets["value"].mean(axis=1))
+        assert len(history.pending[level]) < 4
+
+
+def test_history_memory_is_bounded_and_query_picks_coarser_levels():
+    history, samples = fill_history(50000, chunk=500)
+
+    # raw ring plus three 64 record levels, however much went in
+    assert all(len(level.buffer) == 2 * 64 for level in history.levels)
+
+    recent = history.query(49990, 50000, max_points=100)
+    assert np.array_equal(recent["value_mean"], samples["value"][49989:])
+
+    # the whole session only reaches back as far as the coarsest level goes
+    whole = history.query(0, 50000, max_points=100)
+    assert np.all(np.diff(whole["timestamp"]) == 64)
+    assert whole["value_max"].max() == samples["value"][-64 * 64 :].max()
+
+    # a span the middle level covers in few enough points comes from there
+    middle = history.query(49000, 50000, max_points=100)
+    assert np.all(np.diff(middle["timestamp"]) == 16)
+
+
+def test_plot_view_draws_history_envelope_when_zoomed_out():
+    QApplication.instance() or QApplication([])
+    view = PlotView()
+    history, samples = fill_history(50000, chunk=500)
+    rx_data = history.raw.get_all()
+    view.linear_plot_widget.getViewBox().setXRange(0, 50000, padding=0)
+
+    records = view.history_records(history, rx_data)
+    view.set_envelope_curve(view.plot_echo, records, "value", -1)
+
+    xs, ys = view.plot_echo.getData()
+    assert xs.min() < rx_data["timestamp"][0]
+    assert ys.min() == -records["value_max"].max()
+    view.close()
+
+
+class StubModel(QObject):
+    """Just enough of Model for the Controller, no ports or joystick."""
+
+    data_changed = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self.stats = PipelineStats()
+        self.serial_dirty = False
+        self.bluetooth_dirty = False
+        self.echoed_speed = 0
+        self.serial_history = self.bluetooth_history = None
+        self.acceleration = self.speed0_scale = self.speed1_scale = self.speed23_scale = 1
+
+    def send_packet(self):
+        pass
+
+    def get_serial_data(self):
+        return None
+
+    def get_bluetooth_data(self):
+        return None
+
+    def publish(self, serial=True, bluetooth=False):
+        self.serial_dirty |= serial
+        self.bluetooth_dirty |= bluetooth
+        self.data_changed.emit()
+
+
+def run_events(seconds):
+    app = QApplication.instance() or QApplication([])
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def test_controller_renders_only_on_new_data():
+    """A burst of notifications is one render, only the plot that changed is redrawn,
+    and nothing is drawn while no data comes in."""
+    QApplication.instance() or QApplication([])
+    model = StubModel()
+    view = mock.MagicMock()
+    controller = Controller(model, view, max_fps=50)
+
+    run_events(0.1)
+    assert view.update_serial.call_count == 0
+
+    for _ in range(100):
+        model.publish()
+    run_events(0.05)
+    assert view.update_serial.call_count == 1
+    assert view.update_bluetooth.call_count == 0
+
+    model.publish(serial=False, bluetooth=True)
+    run_events(0.05)
+    assert view.update_serial.call_count == 1
+    assert view.update_bluetooth.call_count == 1
+    controller.timer.stop()
+
+
+def test_controller_caps_frame_rate():
+    QApplication.instance() or QApplication([])
+    model = StubModel()
+    view = mock.MagicMock()
+    controller = Controller(model, view, max_fps=20)
+
+    end = time.monotonic() + 0.5
+    while time.monotonic() < end:
+        model.publish()
+        run_events(0.002)
+
+    # 20 fps for half a second, the first render goes out straight away
+    assert 8 <= view.update_serial.call_count <= 12
+    controller.timer.stop()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
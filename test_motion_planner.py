@@ -1,5 +1,15 @@
+import numpy
 import pytest
-from motion_planner import ramp_velocity
+from motion_planner import (
+    ramp_velocity,
+    ramp_profile,
+    s_curve_velocity,
+    s_curve_profile,
+    SCurveProfile,
+    SynchronizedProfile,
+    Motor,
+    simulate_motors,
+)
 
 
 def test_ramp_start():
@@ -54,5 +64,200 @@ def test_negative_ramp():
     assert v2 < v1
 
 
+def test_ramp_profile_matches_scalar():
+    """The array version should agree with ramp_velocity at every sample."""
+    t = numpy.linspace(-1, 6, 200)
+    vel, acc, jerk = ramp_profile(t, start_vel=30, target_vel=0, max_accel=10)
+    assert numpy.allclose(vel, [ramp_velocity(x, 30, 0, 10) for x in t])
+    assert set(acc) == {-10.0, 0.0}
+    assert not jerk.any()
+
+
+def test_s_curve_profile_matches_scalar():
+    """For a trapezoid from rest the array version reproduces s_curve_velocity."""
+    t = numpy.linspace(0, 6, 600)
+    vel, _, _ = s_curve_profile(t, 0, 0, 30, 15, 10)
+    assert numpy.allclose(vel, [s_curve_velocity(x, 0, 0, 30, 15, 10) for x in t])
+
+
+@pytest.mark.parametrize(
+    "start_vel, start_accel, target_vel",
+    [(0, 0, 30), (0, 0, 5), (30, 0, -5), (0, 4, 30), (10, 0, 12), (0, 14, 1), (5, -12, 0)],
+)
+def test_s_curve_profile_is_continuous_and_limited(start_vel, start_accel, target_vel):
+    """Velocity and acceleration are continuous, limits hold and the target is reached."""
+    dt = 0.001
+    t = numpy.arange(0, 10, dt)
+    vel, acc, jerk = s_curve_profile(t, start_vel, start_accel, target_vel, max_accel=15, max_jerk=10)
+
+    assert vel[0] == start_vel
+    assert vel[-1] == pytest.approx(target_vel)
+    assert numpy.abs(acc).max() <= 15 + 1e-9
+    assert numpy.abs(jerk).max() <= 10 + 1e-9
+    assert numpy.abs(numpy.diff(vel)).max() <= 15 * dt + 1e-6
+    assert numpy.abs(numpy.diff(acc)).max() <= 10 * dt + 1e-6
+    # the acceleration array is the derivative of the velocity array
+    assert numpy.allclose(numpy.gradient(vel, dt)[1:-1], acc[1:-1], atol=0.05)
+
+
+def test_s_curve_takes_back_start_accel():
+    """When start_accel alone carries the velocity past the target, the profile goes no
+    further than ramping it down at max_jerk has to and comes back without a jump."""
+    dt = 0.001
+    t = numpy.arange(0, 5, dt)
+    vel, acc, jerk = s_curve_profile(t, 0, 100, 1, max_accel=1000, max_jerk=100)
+
+    # 100**2 / (2 * 100) is covered before the acceleration can be back at zero
+    assert vel.max() == pytest.approx(50, rel=1e-4)
+    assert acc.min() < 0
+    assert numpy.abs(jerk).max() <= 100 + 1e-9
+    assert numpy.abs(numpy.diff(vel)).max() <= 100 * dt + 1e-6
+    assert vel[-1] == pytest.approx(1)
+
+
+def test_s_curve_start_accel_above_limit():
+    dt = 0.001
+    t = numpy.arange(0, 10, dt)
+    vel, acc, _ = s_curve_profile(t, 0, 20, 30, max_accel=15, max_jerk=10)
+
+    assert acc[0] == 20
+    # brought down to the limit at max_jerk, then held there
+    assert numpy.abs(acc[t >= 0.5]).max() <= 15 + 1e-9
+    assert numpy.abs(numpy.diff(acc)).max() <= 10 * dt + 1e-6
+    assert vel[-1] == pytest.approx(30)
+
+
+def test_s_curve_triangle_returns_velocity():
+    """Small velocity changes never reach max_accel but still return a velocity."""
+    v = s_curve_velocity(0.5, start_vel=0, start_accel=0, target_vel=5, max_accel=15, max_jerk=10)
+    assert v == pytest.approx(0.5 * 10 * 0.5**2)
+
+
+def test_profile_phase_table():
+    profile = SCurveProfile(0, 0, 30, max_accel=15, max_jerk=10)
+    phases = profile.phases
+
+    assert [p.name for p in phases] == ["jerk_up", "cruise", "jerk_down"]
+    assert phases[0].end == pytest.approx(1.5)  # 15 / 10 to reach max accel
+    assert phases[1].end - phases[1].start == pytest.approx(0.5)
+    assert profile.duration == pytest.approx(3.5)
+    assert phases[-1].end == profile.duration
+
+
+def test_profile_sample_matches_evaluate():
+    profile = SCurveProfile(-3, 2, 12, max_accel=6, max_jerk=20)
+    t = numpy.linspace(-0.5, profile.duration + 0.5, 97)
+    vel, acc, jerk = profile.evaluate(t)
+    for i, x in enumerate(t):
+        assert profile.sample(x) == pytest.approx((vel[i], acc[i], jerk[i]))
+
+
+def test_profile_phase_table_with_start_accel_overshoot():
+    """A start_accel that has to be taken back gives forward running phases and a jerk
+    down phase that ramps the negative peak back up to zero."""
+    profile = SCurveProfile(0, 100, 1, max_accel=1000, max_jerk=100)
+    phases = profile.phases
+
+    assert all(p.end >= p.start for p in phases)
+    assert profile.peak_accel < 0
+    assert [p.jerk for p in phases] == [-100, 0, 100]
+    assert profile.velocity(profile.duration) == pytest.approx(1)
+
+    t = numpy.linspace(0, profile.duration + 0.5, 97)
+    vel, acc, jerk = profile.evaluate(t)
+    for i, x in enumerate(t):
+        assert profile.sample(x) == pytest.approx((vel[i], acc[i], jerk[i]))
+
+
+def test_synchronized_axes_finish_together():
+    """Every axis reaches its target at the duration of the slowest axis, within its limits."""
+    start_vel = [0, 0, 100, -50]
+    start_accel = [0, 0, 0, 5]
+    target_vel = [3000, -200, 400, 800]
+    max_accel = [15000, 15000, 8000, 15000]
+    max_jerk = [80000, 80000, 50000, 80000]
+    profile = SynchronizedProfile(start_vel, start_accel, target_vel, max_accel, max_jerk)
+
+    single = [SCurveProfile(*args) for args in zip(start_vel, start_accel, target_vel, max_accel, max_jerk)]
+    assert profile.duration == pytest.approx(max(p.duration for p in single))
+    assert numpy.allclose(profile.durations, profile.duration)
+
+    t = numpy.linspace(0, profile.duration, 4001)
+    vel, acc, jerk = profile.evaluate(t)
+    assert vel.shape == (4, len(t))
+    assert numpy.allclose(vel[:, -1], target_vel)
+    assert numpy.all(numpy.abs(acc).max(axis=1) <= numpy.array(max_accel) + 1e-6)
+    assert numpy.all(numpy.abs(jerk).max(axis=1) <= numpy.array(max_jerk) + 1e-6)
+    # the slowest axis keeps its own fastest profile
+    slowest = numpy.argmax([p.duration for p in single])
+    assert numpy.allclose(vel[slowest], single[slowest].evaluate(t)[0])
+
+
+def test_synchronized_replan_from_start_accel():
+    """Replanning mid ramp with a small velocity change left: no jump at the end and no
+    more overshoot than taking the start acceleration back at max_jerk forces."""
+    profile = SynchronizedProfile([625, 0], [25000, 0], [725, 0], 50000, 500000)
+    assert profile.durations[0] == pytest.approx(profile.duration)
+
+    dt = 1e-4
+    t = numpy.arange(0, profile.duration + 0.01, dt)
+    vel, acc, _ = profile.evaluate(t)
+    assert vel[0].max() == pytest.approx(625 + 25000**2 / (2 * 500000), rel=1e-4)
+    assert numpy.abs(numpy.diff(vel[0])).max() <= 50000 * dt + 1e-6
+    assert vel[0, -1] == pytest.approx(725)
+
+
+def test_synchronized_stretches_axes_with_start_accel():
+    """Axes that have to take back or bring down their start acceleration still arrive
+    with the slowest one and without a velocity jump."""
+    start_accel = [25000, 60000, -20000, 0]
+    target_vel = [725, 2000, 300, 3000]
+    profile = SynchronizedProfile([625, 0, 0, 0], start_accel, target_vel, 40000, 500000)
+    assert numpy.allclose(profile.durations, profile.duration)
+
+    dt = 1e-4
+    t = numpy.arange(0, profile.duration + 0.01, dt)
+    vel, acc, _ = profile.evaluate(t)
+    assert numpy.abs(numpy.diff(vel, axis=1)).max() <= 60000 * dt + 1e-6
+    assert numpy.abs(acc[:, t > (60000 - 40000) / 500000]).max() <= 40000 + 1e-6
+    assert numpy.allclose(vel[:, -1], target_vel)
+
+
+def test_synchronized_idle_axis_stays_put():
+    profile = SynchronizedProfile([0, 7], 0, [100, 7], 50, 200)
+    vel, acc, _ = profile.evaluate(numpy.linspace(0, profile.duration, 50))
+    assert numpy.all(vel[1] == 7)
+    assert not acc[1].any()
+
+
+def test_simulate_motors_matches_motor_loop_accel():
+    """Acceleration commands integrate exactly like stepping Motor.update."""
+    rng = numpy.random.default_rng(0)
+    commands = rng.normal(size=(3, 50))
+    sim = simulate_motors(accel_commands=commands, start_pos=[0, 1, 2], start_vel=[0, -1, 5])
+
+    for i, (p0, v0) in enumerate([(0, 0), (1, -1), (2, 5)]):
+        motor = Motor(start_pos=p0, start_vel=v0)
+        for step, a in enumerate(commands[i]):
+            motor.accel = a
+            motor.update()
+            assert sim.pos[i, step] == pytest.approx(motor.pos)
+            assert sim.vel[i, step] == pytest.approx(motor.vel)
+
+
+def test_simulate_motors_matches_motor_loop_velocity():
+    """Velocity commands reproduce the update-then-set-velocity loop of the planner demo."""
+    commands = numpy.linspace(0, 30, 40) ** 1.5
+    sim = simulate_motors(vel_commands=commands, start_vel=2)
+
+    motor = Motor(start_pos=0, start_vel=2)
+    for step, v in enumerate(commands):
+        motor.update()
+        motor.vel = v
+        assert sim.pos[0, step] == pytest.approx(motor.pos)
+    assert numpy.allclose(sim.vel[0], commands)
+    assert numpy.allclose(sim.accel[0], numpy.diff(commands, prepend=2))
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,41 @@
+import numpy
+import pytest
+from motion_planner import SCurveProfile
+from scurve_sweep import make_grid, sweep
+
+
+def test_sweep_metrics_match_profile():
+    """Each row describes the same profile SCurveProfile would plan for those parameters."""
+    grid = make_grid([0, 100], [0], [500, -800, 3000], [5000, 20000], [1e4, 1e5])
+    table = sweep(grid, dt=1e-4, workers=1, chunk_size=5)
+
+    assert len(table) == 24
+    for row in table:
+        profile = SCurveProfile(row["start_vel"], row["start_accel"], row["target_vel"], row["max_accel"], row["max_jerk"])
+        assert row["duration"] == pytest.approx(profile.duration, rel=1e-5)
+        assert row["peak_jerk"] == pytest.approx(row["max_jerk"])
+        assert row["peak_accel"] <= row["max_accel"] * (1 + 1e-6)
+        assert 0 < row["settle_time"] <= profile.duration + 1e-4
+        assert row["overshoot"] == pytest.approx(0, abs=1e-3)
+
+
+def test_sweep_reports_start_accel_overshoot():
+    """A start_accel that alone carries the velocity past the target shows up as overshoot."""
+    table = sweep(make_grid([0], [20000], [100], [20000], [1e5]), dt=1e-4, workers=1)
+    row = table[0]
+    profile = SCurveProfile(0, 20000, 100, 20000, 1e5)
+
+    # 20000**2 / (2 * 1e5) covered before the acceleration is back at zero
+    assert row["overshoot"] == pytest.approx(1900, rel=1e-3)
+    assert row["duration"] == pytest.approx(profile.duration, rel=1e-5)
+    assert profile.evaluate(profile.duration)[0] == pytest.approx(100)
+    assert row["settle_time"] > 0.2
+
+
+def test_sweep_process_pool_matches_in_process():
+    grid = make_grid([0], [0, 1000], numpy.linspace(100, 4000, 7), [8000, 30000], [5e4, 5e5])
+    assert numpy.array_equal(sweep(grid, workers=2, chunk_size=8), sweep(grid, workers=1, chunk_size=8))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])